@@ -4,78 +4,135 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import asyncio
-import json
 import logging
 import signal
 import os
-import multiprocessing
+import time
+import uuid
 
 import websockets
-from websockets.exceptions import ConnectionClosedError, ConnectionClosedOK
 
-from src.lib.miner import solve_block
+from src.lib.miner import configure_start_method, solve_block
+from src.lib.upstream import Upstream
+from src.helpers.framing import (
+    BINARY_SUBPROTOCOL,
+    decode_message,
+    encode_binary,
+    encode_for,
+    encode_json,
+    is_binary,
+)
 from src.helpers.logger import logger
+from src.helpers.netprofile import install_event_loop
 from src.helpers.setup import setup_environment
+from src.helpers.watchdog import LoopWatchdog, SamplingProfiler
 
 SERVER_URL = os.getenv("SERVER_URL")
+# Comma-separated pool URLs in priority order; defaults to SERVER_URL alone
+SERVER_URLS = [
+    url.strip()
+    for url in os.getenv("SERVER_URLS", SERVER_URL or "").split(",")
+    if url.strip()
+]
+# Identifies this miner to the pool across reconnects; random per process unless set
+MINER_ID = os.getenv("MINER_ID") or uuid.uuid4().hex
+
+# "miner" hashes locally; "proxy" relays one pool session to local miners
+MINER_MODE = os.getenv("MINER_MODE", "miner")
+PROXY_HOST = os.getenv("PROXY_HOST", "0.0.0.0")
+PROXY_PORT = int(os.getenv("PROXY_PORT", "8766"))
+# Optional Unix socket for local miners, served alongside the TCP port
+PROXY_SOCKET = os.getenv("PROXY_SOCKET")
 
 
 class ConnectionManager:
-    def __init__(self, server_url):
+    def __init__(self, server_urls):
         """
-        Initialize ConnectionManager with server URL and necessary attributes.
+        Initialize ConnectionManager with the pool URLs, in priority order.
         """
-        self.server_url = server_url
-        self.websocket = None
+        self.upstreams = [
+            Upstream(url, priority, MINER_ID, self.handle_upstream_event)
+            for priority, url in enumerate(server_urls)
+        ]
+        self.active = None
         self.solve_task = None
-        self.keep_alive_task = None
         self.start = 0
         self.end = 4294967296  # 2^32
+        self.miner_id = MINER_ID
+        self.current_job = None
+        # Set when mining stops for want of a job, cleared when it resumes
+        self.idle_since = None
+        self.failovers = 0
+        self.failover_idle_total = 0.0
 
-    async def establish_connection(self):
+    async def handle_upstream_event(self, upstream, event, message):
         """
-        Establish a persistent WebSocket connection with the server.
-        Reconnects if the connection fails.
+        Route a message from one of the pools. Only the active pool drives
+        mining; any other event may make a better pool ready to take over.
         """
+        if upstream is not self.active or event == "disconnected":
+            await self.select_upstream()
+        elif event == "height_changed":
+            await self.handle_height_changed(message)
+        elif event == "range_assignment":
+            await self.handle_range_assignment(message)
+        elif event == "error":
+            logger.warning(f"Pool {upstream} rejected a message: {message}")
+
+    async def select_upstream(self):
+        """Mine on the highest-priority ready pool, switching to it immediately."""
+        best = next((u for u in self.upstreams if u.is_ready()), None)
+        if best is self.active:
+            return
+        previous, self.active = self.active, best
+        if previous is not None and self.idle_since is None:
+            self.idle_since = time.monotonic()
+        if best is None:
+            logger.warning(f"Lost pool {previous}, no other pool is ready")
+            if self.solve_task and not self.solve_task.done():
+                self.solve_task.cancel()
+            return
+
+        logger.info(
+            f"Mining on {best}"
+            + (f" (was {previous})" if previous is not None else "")
+            + (f", RTT {best.rtt * 1000:.1f} ms" if best.rtt is not None else "")
+        )
+        if best.range is not None:
+            start, end = best.range
+            await self.handle_range_assignment({"start": start, "end": end})
+        await self.handle_height_changed(best.job)
+
+    async def watch_upstreams(self, interval=1):
+        """Close stale connections and re-evaluate which pool to mine on."""
         while True:
-            try:
-                self.websocket = await websockets.connect(self.server_url)
-                logger.info("Connected to server")
-                return
-            except (ConnectionRefusedError, OSError) as e:
-                logger.error(
-                    f"Connection attempt failed: {e}. Retrying in 10 seconds..."
-                )
-                await asyncio.sleep(10)
+            await asyncio.sleep(interval)
+            for upstream in self.upstreams:
+                if upstream.is_connected() and upstream.is_stale():
+                    logger.warning(f"Pool {upstream} went stale, reconnecting")
+                    await upstream.close()
+            await self.select_upstream()
 
-    async def handle_server_messages(self):
-        """
-        Listen for messages from the server and handle them accordingly.
-        """
-        try:
-            async for message in self.websocket:
-                message_data = json.loads(message)
-                event = message_data.get("event")
-                msg = message_data.get("message")
-
-                if event == "height_changed":
-                    await self.handle_height_changed(msg)
-                elif event == "range_assignment":
-                    await self.handle_range_assignment(msg)
-        except (ConnectionClosedError, ConnectionClosedOK):
-            logger.warning("Connection closed. Reconnecting...")
-        except json.JSONDecodeError as e:
-            logger.error(f"Error decoding JSON: {e}")
-        except Exception as e:
-            logger.error(f"Unexpected error: {e}")
+    def record_resumed(self):
+        """Report how long mining was idle when work resumes after a failover."""
+        if self.idle_since is None:
+            return
+        idle = time.monotonic() - self.idle_since
+        self.idle_since = None
+        self.failovers += 1
+        self.failover_idle_total += idle
+        logger.info(
+            f"Failover to {self.active} resumed mining after {idle * 1000:.1f} ms idle "
+            f"({self.failovers} failovers, mean idle "
+            f"{self.failover_idle_total / self.failovers * 1000:.1f} ms)"
+        )
 
     async def send_message(self, event, message):
         """
-        Send a message to the WebSocket server if connected.
+        Send a message to the active pool if connected.
         """
         if self.is_connected():
-            message_json = json.dumps({"event": event, "message": message})
-            await self.websocket.send(message_json)
+            await self.active.send(event, message)
         else:
             logger.warning("Attempted to send message, but WebSocket is not connected")
 
@@ -105,7 +162,17 @@ class ConnectionManager:
         """
         if self.solve_task and not self.solve_task.done():
             self.solve_task.cancel()
+        # The pool resent the job we were on (e.g. after its restart): keep the
+        # timestamps already searched instead of starting the range over
+        job = self.current_job
+        if job is not None and all(
+            job.get(key) == tmpl.get(key)
+            for key in ("job_id", "prev_block", "mrkl_root")
+        ):
+            tmpl["timestamp"] = max(tmpl["timestamp"], job["timestamp"])
+        self.current_job = tmpl
         self.solve_task = asyncio.create_task(self.solve_block_task(tmpl))
+        self.record_resumed()
 
     async def solve_block_task(self, tmpl):
         """
@@ -132,7 +199,11 @@ class ConnectionManager:
                 if nonce != "xxx":
                     logger.info(f"Sending nonce: {nonce}")
                     await self.send_nonce_found(
-                        {"nonce": nonce, "timestamp": tmpl["timestamp"]}
+                        {
+                            "job_id": tmpl.get("job_id"),
+                            "nonce": nonce,
+                            "timestamp": tmpl["timestamp"],
+                        }
                     )
                     break
                 else:
@@ -147,45 +218,122 @@ class ConnectionManager:
         except Exception as e:
             logger.error(f"Error in solving block: {e}")
 
-    async def keep_alive(self):
+    async def connect_to_server(self):
         """
-        Send periodic ping messages to keep the WebSocket connection alive.
+        Keep a connection open to every pool and mine on the best ready one.
         """
-        try:
-            while True:
-                if self.is_connected():
-                    await self.send_message("ping", 1)
-                else:
-                    logger.warning(
-                        "Keep-alive ping skipped, WebSocket is not connected"
-                    )
-                await asyncio.sleep(5)
-        except Exception as e:
-            logger.error(f"Keep-alive error: {e}")
+        await asyncio.gather(
+            self.watch_upstreams(), *[upstream.run() for upstream in self.upstreams]
+        )
 
-    async def connect_to_server(self):
+    def is_connected(self):
         """
-        Establish a connection and manage tasks for handling messages and keeping alive.
+        Check if the active pool's WebSocket is connected.
         """
-        while True:
-            await self.establish_connection()
-            receive_task = asyncio.create_task(self.handle_server_messages())
-            self.keep_alive_task = asyncio.create_task(self.keep_alive())
+        return self.active is not None and self.active.is_connected()
+
+
+class MinerProxy(ConnectionManager):
+    """
+    Proxy mode: one upstream pool session shared by the miners of a host or
+    rack. Local miners speak the same protocol to the proxy; it splits its
+    own range among them, fans jobs out locally and relays their solutions.
+    """
+
+    def __init__(self, server_urls):
+        super().__init__(server_urls)
+        self.local_miners = set()
 
-            done, pending = await asyncio.wait(
-                [receive_task, self.keep_alive_task],
-                return_when=asyncio.FIRST_COMPLETED,
+    async def serve_local(self, host=PROXY_HOST, port=PROXY_PORT, path=PROXY_SOCKET):
+        """Accept local miners on a TCP port and, optionally, a Unix socket."""
+        options = {"subprotocols": [BINARY_SUBPROTOCOL]}
+        servers = [
+            await websockets.serve(self.handle_local_miner, host, port, **options)
+        ]
+        logger.info(f"Proxy accepting miners on {host}:{port}")
+        if path:
+            if os.path.exists(path):
+                os.unlink(path)
+            servers.append(
+                await websockets.unix_serve(self.handle_local_miner, path, **options)
             )
-            for task in pending:
-                task.cancel()
-            logger.info("Reconnecting to the server in 10 seconds...")
-            await asyncio.sleep(10)
+            logger.info(f"Proxy accepting miners on {path}")
+        return servers
 
-    def is_connected(self):
-        """
-        Check if the WebSocket is connected.
-        """
-        return self.websocket is not None and self.websocket.open
+    async def handle_local_miner(self, websocket, path=None):
+        """Serve one local miner."""
+        self.local_miners.add(websocket)
+        logger.info(f"Local miner connected. Total miners: {len(self.local_miners)}")
+        await self.divide_range_among_clients()
+        if self.current_job is not None:
+            await websocket.send(
+                encode_for(websocket, "height_changed", self.current_job)
+            )
+
+        try:
+            async for message in websocket:
+                event, msg_content = decode_message(message)
+
+                if event == "nonce_found":
+                    # Solutions go upstream on the single pool session
+                    await self.send_nonce_found(msg_content)
+                elif event == "ping":
+                    await websocket.send(
+                        encode_for(websocket, "ping", f"Ping back: {msg_content}")
+                    )
+                elif event != "hello":
+                    logger.warning(f"Received unknown event from local miner: {event}")
+        except websockets.ConnectionClosed:
+            logger.warning("Local miner connection closed unexpectedly")
+        finally:
+            self.local_miners.discard(websocket)
+            logger.info(
+                f"Local miner disconnected. Total miners: {len(self.local_miners)}"
+            )
+            await self.divide_range_among_clients()
+
+    async def handle_range_assignment(self, message):
+        """Take the range the pool assigned and split it among local miners."""
+        await super().handle_range_assignment(message)
+        await self.divide_range_among_clients()
+
+    async def handle_height_changed(self, tmpl):
+        """Fan a new job out to every local miner, encoded once per format."""
+        self.current_job = tmpl
+        self.record_resumed()
+        if self.local_miners:
+            message_json = encode_json("height_changed", tmpl)
+            message_binary = encode_binary("height_changed", tmpl)
+            await asyncio.gather(
+                *[
+                    miner.send(message_binary if is_binary(miner) else message_json)
+                    for miner in self.local_miners
+                ],
+                return_exceptions=True,
+            )
+
+    async def divide_range_among_clients(self):
+        """Distribute the proxy's nonce range among its local miners."""
+        miners = list(self.local_miners)
+        if not miners:
+            return
+        range_per_miner = (self.end - self.start) // len(miners)
+        current_start = self.start
+        for i, miner in enumerate(miners):
+            current_end = current_start + range_per_miner
+            if i == len(miners) - 1:
+                current_end = self.end
+            try:
+                await miner.send(
+                    encode_for(
+                        miner,
+                        "range_assignment",
+                        {"start": current_start, "end": current_end},
+                    )
+                )
+            except websockets.ConnectionClosed:
+                pass
+            current_start = current_end
 
 
 async def main():
@@ -193,7 +341,11 @@ async def main():
     Main function to initialize and start the ConnectionManager.
     """
     setup_environment()
-    manager = ConnectionManager(SERVER_URL)
+    if MINER_MODE == "proxy":
+        manager = MinerProxy(SERVER_URLS)
+        await manager.serve_local()
+    else:
+        manager = ConnectionManager(SERVER_URLS)
 
     loop = asyncio.get_running_loop()
 
@@ -209,6 +361,10 @@ async def main():
     loop.add_signal_handler(signal.SIGINT, shutdown)
     loop.add_signal_handler(signal.SIGTERM, shutdown)
 
+    # Log event loop stalls; SIGUSR1 writes a sampling profile
+    LoopWatchdog().start()
+    loop.add_signal_handler(signal.SIGUSR1, SamplingProfiler().trigger)
+
     try:
         await manager.connect_to_server()
     except asyncio.CancelledError:
@@ -218,6 +374,8 @@ async def main():
 
 
 if __name__ == "__main__":
-    # Set the start method to spawn to ensure Manager connections work correctly in Docker
-    multiprocessing.set_start_method("spawn", force=True)
+    # Never fork the threaded event loop process itself (Manager connections
+    # break in Docker); workers come from a preloaded forkserver or spawn
+    configure_start_method()
+    install_event_loop()
     asyncio.run(main())
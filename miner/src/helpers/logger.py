@@ -1,16 +1,136 @@
+import atexit
+import json
 import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 
 
+# Log output format: "text" (aligned columns) or "json" (one object per line)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Records kept in memory for the background writer before new ones are dropped
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Per-call-site limit for INFO and below, in records per second (0 disables)
+LOG_RATE_LIMIT = float(os.getenv("LOG_RATE_LIMIT", "5"))
+LOG_RATE_BURST = float(os.getenv("LOG_RATE_BURST", "20"))
+
+# Neither format shows thread or process names; not collecting them makes
+# every record cheaper to create
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "file": record.filename,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry)
+
+
+class RateLimiter(logging.Filter):
+    """
+    Token-bucket rate limit per call site (record path and line number).
+
+    Installed as a logger filter, so a throttled record is dropped before it
+    reaches the queue or any handler. Warnings and errors always pass. The
+    next record let through from a throttled call site notes how many records
+    were suppressed.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [self.burst, now, 0]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            bucket[2] += 1
+            return False
+        bucket[0] = tokens - 1
+        if bucket[2]:
+            record.msg = (
+                f"{record.getMessage()} ({bucket[2]} similar messages suppressed)"
+            )
+            record.args = None
+            bucket[2] = 0
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments into the message in place; unlike the stock
+        # handler, this neither copies the record nor runs a formatter.
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+        else:
+            self.queue.put_nowait(record)
+
+
+def log_directly(logger: logging.Logger, queue_handler: DroppingQueueHandler) -> None:
+    """Replace the queue handler with its own handlers, writing synchronously."""
+    logger.removeHandler(queue_handler)
+    for handler in queue_handler.listener.handlers:
+        logger.addHandler(handler)
+
+
 def setup_logger(
-    name: Optional[str] = None, log_level: int = logging.INFO
+    name: Optional[str] = None,
+    log_level: int = logging.INFO,
+    json_format: bool = LOG_FORMAT == "json",
+    rate_limit: float = LOG_RATE_LIMIT,
+    rate_burst: float = LOG_RATE_BURST,
 ) -> logging.Logger:
     """
     Set up a logger with consistent format and aligned output.
 
+    Records are handed to a bounded queue and written by a background thread,
+    so callers only pay for creating the record, not for formatting and I/O.
+
     Args:
         name: Logger name (optional). If None, returns root logger
         log_level: Logging level (default: logging.INFO)
+        json_format: Write one JSON object per line instead of aligned text
+        rate_limit: Per-call-site limit for INFO and below, records per second (0 disables)
+        rate_burst: Records a call site may log at once before the limit applies
 
     Returns:
         logging.Logger: Configured logger instance
@@ -22,22 +142,37 @@ def setup_logger(
     # Remove existing handlers to avoid duplicate logging
     if logger.handlers:
         logger.handlers.clear()
+    logger.filters = [f for f in logger.filters if not isinstance(f, RateLimiter)]
 
-    # Create console handler
+    # Create console handler, driven by the background listener thread
     handler = logging.StreamHandler()
     handler.setLevel(log_level)
 
-    # Create formatter with fixed-width fields
-    # %(filename)-20s: Left-aligned filename with 20 char width
-    # %(lineno)4d: Right-aligned line number with 4 char width
-    # %(levelname)-8s: Left-aligned level name with 8 char width
-    formatter = logging.Formatter(
-        "%(asctime)s - %(filename)-20s - %(lineno)4d - %(levelname)-8s - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+    if json_format:
+        formatter = JsonFormatter(datefmt="%Y-%m-%d %H:%M:%S")
+    else:
+        # Create formatter with fixed-width fields
+        # %(filename)-20s: Left-aligned filename with 20 char width
+        # %(lineno)4d: Right-aligned line number with 4 char width
+        # %(levelname)-8s: Left-aligned level name with 8 char width
+        formatter = logging.Formatter(
+            "%(asctime)s - %(filename)-20s - %(lineno)4d - %(levelname)-8s - %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+        )
 
     handler.setFormatter(formatter)
-    logger.addHandler(handler)
+
+    queue_handler = DroppingQueueHandler(queue.SimpleQueue(), LOG_QUEUE_SIZE)
+    if rate_limit > 0:
+        logger.addFilter(RateLimiter(rate_limit, rate_burst))
+    queue_handler.listener = QueueListener(queue_handler.queue, handler)
+    queue_handler.listener.start()
+    atexit.register(queue_handler.listener.stop)
+    # The writer thread does not survive a fork, and forked workers exit
+    # without running atexit, so a forked child (fork or forkserver start
+    # method) writes its records itself
+    os.register_at_fork(after_in_child=lambda: log_directly(logger, queue_handler))
+    logger.addHandler(queue_handler)
 
     return logger
 
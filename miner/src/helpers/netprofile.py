@@ -0,0 +1,57 @@
+import asyncio
+import os
+import socket
+
+from src.helpers.logger import logger
+
+
+# "default" keeps library defaults; "fast" enables the high-performance profile
+NET_PROFILE = os.getenv("NET_PROFILE", "default")
+
+# Job, range and ping messages are a few hundred bytes at most
+FAST_PROFILE_OPTIONS = {
+    # Per-message deflate costs more CPU than it saves on tiny messages
+    "compression": None,
+    # Incoming messages buffered per connection before reads apply backpressure
+    "max_queue": 16,
+    "max_size": 2**20,
+    # Transport write buffer high-water mark
+    "write_limit": 2**16,
+    # Liveness is covered by the miner's own pings and the pool's idle timer wheel
+    "ping_interval": None,
+}
+
+
+def fast_profile():
+    return NET_PROFILE == "fast"
+
+
+def install_event_loop():
+    """Use uvloop for new event loops when the fast profile is on and it is installed."""
+    if not fast_profile():
+        return False
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("NET_PROFILE=fast but uvloop is not installed, using asyncio")
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info("Using uvloop event loop")
+    return True
+
+
+def server_options():
+    """Keyword arguments for `websockets.serve` under the active profile."""
+    return dict(FAST_PROFILE_OPTIONS) if fast_profile() else {}
+
+
+def client_options():
+    """Keyword arguments for `websockets.connect` under the active profile."""
+    return dict(FAST_PROFILE_OPTIONS) if fast_profile() else {}
+
+
+def set_nodelay(websocket):
+    """Disable Nagle's algorithm on the connection's socket explicitly."""
+    sock = websocket.transport.get_extra_info("socket")
+    if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
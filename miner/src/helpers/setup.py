@@ -8,12 +8,9 @@ def setup_environment() -> None:
     Validate additional environment variables and perform initial setup.
     Raises an error if required environment variables are missing.
     """
-    required_vars = ["SERVER_URL"]
-    missing_vars = [var for var in required_vars if not os.getenv(var)]
-
-    if missing_vars:
+    if not os.getenv("SERVER_URLS") and not os.getenv("SERVER_URL"):
         raise EnvironmentError(
-            f"Missing required environment variables: {', '.join(missing_vars)}"
+            "Missing required environment variables: SERVER_URL or SERVER_URLS"
         )
 
-    logger.info("SERVER_URL " + os.getenv("SERVER_URL", ""))
+    logger.info("SERVER_URLS " + os.getenv("SERVER_URLS", os.getenv("SERVER_URL", "")))
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+from src.helpers.logger import logger
+
+
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", "0.25"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", ".")
+PROFILE_SECONDS = float(os.getenv("PROFILE_SECONDS", "10"))
+
+
+class LoopWatchdog:
+    """
+    Detect event loop stalls.
+
+    A task on the loop records a heartbeat and its own wake-up lag. A separate
+    thread watches the heartbeat, and when it is older than the threshold the
+    loop is blocked right now, so the loop thread's current stack is the culprit
+    and gets logged.
+    """
+
+    def __init__(self, threshold=LOOP_LAG_THRESHOLD, interval=0.1, on_lag=None):
+        self.threshold = threshold
+        self.interval = interval
+        self.on_lag = on_lag
+        self.last_beat = time.monotonic()
+        self.loop_thread_id = None
+        self.stalls = 0
+
+    def start(self):
+        """Start the heartbeat task on the running loop and the watcher thread."""
+        self.loop_thread_id = threading.get_ident()
+        threading.Thread(target=self.watch, name="loop-watchdog", daemon=True).start()
+        return asyncio.create_task(self.heartbeat())
+
+    async def heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            self.last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - start - self.interval, 0.0)
+            if self.on_lag is not None:
+                self.on_lag(lag)
+
+    def watch(self):
+        reported_beat = None
+        while True:
+            time.sleep(self.interval)
+            beat = self.last_beat
+            blocked_for = time.monotonic() - beat
+            if blocked_for < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            self.stalls += 1
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            logger.warning(
+                f"Event loop blocked for {blocked_for:.3f}s, current stack:\n{stack}"
+            )
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the stacks of every thread in the process.
+    Output is in the collapsed-stack format read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.005, directory=PROFILE_DIR):
+        self.interval = interval
+        self.directory = directory
+        self.running = False
+
+    def profile(self, seconds=PROFILE_SECONDS):
+        """Sample for the given duration and write the collapsed stacks to a file."""
+        own_thread = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(frame_name(frame))
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                stacks[";".join(reversed(frames))] += 1
+            time.sleep(self.interval)
+
+        collapsed = "".join(f"{stack} {count}\n" for stack, count in stacks.items())
+        path = os.path.join(
+            self.directory, f"profile-{os.getpid()}-{int(time.time())}.collapsed"
+        )
+        with open(path, "w") as f:
+            f.write(collapsed)
+        logger.info(f"Wrote {sum(stacks.values())} stack samples to {path}")
+        return path, collapsed
+
+    def trigger(self, seconds=PROFILE_SECONDS):
+        """Start a profile in a background thread unless one is already running."""
+        if self.running:
+            logger.warning("Profiler already running")
+            return False
+        self.running = True
+
+        def run():
+            try:
+                self.profile(seconds)
+            finally:
+                self.running = False
+
+        threading.Thread(target=run, name="sampling-profiler", daemon=True).start()
+        return True
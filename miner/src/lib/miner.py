@@ -1,10 +1,30 @@
 import hashlib
 import multiprocessing
+import os
+import statistics
 import time
 from multiprocessing import Manager, Pool, Process
 from src.helpers.logger import logger
 
 
+# "forkserver" forks workers from a server that has already imported the
+# modules below; "spawn" starts every worker from a fresh interpreter
+MINER_START_METHOD = os.getenv("MINER_START_METHOD", "forkserver")
+PRELOAD_MODULES = ["hashlib", "src.helpers.logger", "src.lib.miner"]
+
+
+def configure_start_method(method=MINER_START_METHOD):
+    """Select how worker processes are started; call once before any are created."""
+    if method not in multiprocessing.get_all_start_methods():
+        logger.warning(f"Start method {method} is not available, using spawn")
+        method = "spawn"
+    multiprocessing.set_start_method(method, force=True)
+    if method == "forkserver":
+        multiprocessing.set_forkserver_preload(PRELOAD_MODULES)
+    logger.info(f"Worker start method: {method}")
+    return method
+
+
 def uint256_from_compact(c):
     """Converts a compact representation of a difficulty target into a full 256-bit integer."""
     nbytes = (c >> 24) & 0xFF
@@ -60,6 +80,8 @@ def proof_of_work(params):
         found_nonce,
         progress_dict,
         process_index,
+        launched_at,
+        startup_times,
     ) = params
 
     logger.info(
@@ -72,6 +94,8 @@ def proof_of_work(params):
                 return None  # Exit early if a valid nonce has been found
 
             hash_result = calc_sha256(base_header, nonce)
+            if nonce == start_nonce:
+                startup_times[process_index] = time.time() - launched_at
             progress_dict[process_index] = nonce  # Update progress
 
             if hash_result < target:
@@ -101,6 +125,19 @@ def display_progress(progress_dict, num_processes):
             break  # Exit the loop if we can no longer read the progress dict
 
 
+def log_startup_report(startup_times, num_processes):
+    """Log the time from launching the workers to each worker's first hash."""
+    times = sorted(startup_times.values())
+    if not times:
+        return
+    logger.info(
+        f"Worker start-up ({multiprocessing.get_start_method()}, "
+        f"{len(times)}/{num_processes} workers), launch to first hash: "
+        f"min {times[0] * 1000:.1f} ms, median {statistics.median(times) * 1000:.1f} ms, "
+        f"max {times[-1] * 1000:.1f} ms"
+    )
+
+
 def solve_block(
     version, prev_block, merkle_root, timestamp, bits_diff, start_nonce, end_nonce
 ):
@@ -118,10 +155,12 @@ def solve_block(
 
     logger.info(f"Using {num_processes} processes for mining.")
 
+    launched_at = time.time()
     pool = Pool(processes=num_processes)
     manager = Manager()
     found_nonce = manager.Value("i", None)  # Shared variable for the found nonce
     progress_dict = manager.dict({i: start_nonce for i in range(num_processes)})
+    startup_times = manager.dict()
     params = []
 
     for i in range(num_processes):
@@ -149,6 +188,8 @@ def solve_block(
                 found_nonce,
                 progress_dict,
                 i,
+                launched_at,
+                startup_times,
             )
         )
 
@@ -158,7 +199,11 @@ def solve_block(
     progress_display.start()
 
     try:
-        results = pool.map(proof_of_work, params)
+        pending = pool.map_async(proof_of_work, params)
+        while not pending.ready() and len(startup_times) < num_processes:
+            pending.wait(0.05)
+        log_startup_report(dict(startup_times), num_processes)
+        results = pending.get()
         for r in results:
             if r is not None:
                 result = r
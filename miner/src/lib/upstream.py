@@ -0,0 +1,179 @@
+import asyncio
+import os
+import random
+import struct
+import time
+
+import websockets
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+
+from src.helpers.framing import BINARY_SUBPROTOCOL, decode_message, encode_for
+from src.helpers.logger import logger
+from src.helpers.netprofile import client_options, fast_profile, set_nodelay
+
+
+# Seconds between WebSocket pings to each pool while its round-trip time is unsettled
+PING_INTERVAL = float(os.getenv("PING_INTERVAL", "5"))
+# Pings back off up to this interval while the pool answers steadily
+PING_MAX_INTERVAL = float(os.getenv("PING_MAX_INTERVAL", "30"))
+# A pool that has sent nothing (not even a pong) for this long past its ping interval is stale
+UPSTREAM_STALE_TIMEOUT = float(os.getenv("UPSTREAM_STALE_TIMEOUT", "15"))
+# A pool whose smoothed round-trip time exceeds this is not mined on
+UPSTREAM_MAX_RTT = float(os.getenv("UPSTREAM_MAX_RTT", "2"))
+# Reconnect backoff: the delay is drawn from [0, min(max, base * 2^attempt)]
+RECONNECT_BASE_DELAY = float(os.getenv("RECONNECT_BASE_DELAY", "0.5"))
+RECONNECT_MAX_DELAY = float(os.getenv("RECONNECT_MAX_DELAY", "30"))
+# "binary" offers the compact binary framing; the pool may still answer in JSON
+WIRE_PROTOCOL = os.getenv("WIRE_PROTOCOL", "json")
+
+
+def backoff_delay(attempt, base=RECONNECT_BASE_DELAY, cap=RECONNECT_MAX_DELAY):
+    """Exponential backoff with full jitter, so miners do not reconnect in lockstep."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class Upstream:
+    """
+    One pool connection, kept open for the life of the miner.
+
+    It reconnects with jittered exponential backoff, measures round-trip time
+    with WebSocket pings and remembers the latest job and range the pool sent,
+    so a standby can take over without waiting for the pool.
+    """
+
+    def __init__(self, url, priority, miner_id, on_event):
+        self.url = url
+        self.priority = priority
+        self.miner_id = miner_id
+        self.on_event = on_event
+        self.websocket = None
+        self.job = None
+        self.range = None
+        self.rtt = None
+        self.last_seen = 0.0
+        self.ping_interval = PING_INTERVAL
+
+    def __str__(self):
+        return self.url
+
+    def is_connected(self):
+        return self.websocket is not None and self.websocket.open
+
+    def is_stale(self):
+        return (
+            time.monotonic() - self.last_seen
+            > self.ping_interval + UPSTREAM_STALE_TIMEOUT
+        )
+
+    def is_ready(self):
+        """Connected, responsive, fast enough, and holding a job to mine on."""
+        return (
+            self.is_connected()
+            and self.job is not None
+            and not self.is_stale()
+            and (self.rtt is None or self.rtt <= UPSTREAM_MAX_RTT)
+        )
+
+    async def send(self, event, message):
+        await self.websocket.send(encode_for(self.websocket, event, message))
+
+    async def run(self):
+        """Keep the connection open forever, reconnecting with backoff."""
+        attempt = 0
+        while True:
+            try:
+                self.websocket = await self.connect()
+            except (OSError, asyncio.TimeoutError, InvalidHandshake) as e:
+                delay = backoff_delay(attempt)
+                attempt += 1
+                logger.error(
+                    f"Connection to {self.url} failed: {e}. Retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            attempt = 0
+            if fast_profile():
+                set_nodelay(self.websocket)
+            logger.info(f"Connected to {self.url}")
+            self.last_seen = time.monotonic()
+            await self.send("hello", {"miner_id": self.miner_id})
+            keep_alive_task = asyncio.create_task(self.keep_alive())
+            try:
+                await self.receive()
+            finally:
+                keep_alive_task.cancel()
+                self.websocket = None
+                self.job = None
+                self.rtt = None
+                await self.on_event(self, "disconnected", None)
+            await asyncio.sleep(backoff_delay(attempt))
+
+    def connect(self):
+        """Open the WebSocket; "unix:<path>" URLs connect over a Unix socket."""
+        options = client_options()
+        if WIRE_PROTOCOL == "binary":
+            options["subprotocols"] = [BINARY_SUBPROTOCOL]
+        if self.url.startswith("unix:"):
+            return websockets.unix_connect(
+                self.url[len("unix:") :], "ws://localhost/", **options
+            )
+        return websockets.connect(self.url, **options)
+
+    async def receive(self):
+        try:
+            async for message in self.websocket:
+                self.last_seen = time.monotonic()
+                # One bad message or handler error must not stop the miner
+                try:
+                    event, msg = decode_message(message)
+                except (ValueError, struct.error) as e:
+                    logger.error(f"Error decoding message from {self.url}: {e}")
+                    continue
+                try:
+                    if event == "height_changed":
+                        if not isinstance(msg, dict):
+                            raise ValueError(f"job is not an object: {msg!r}")
+                        self.job = msg
+                    elif event == "range_assignment":
+                        self.range = (msg["start"], msg["end"])
+                    await self.on_event(self, event, msg)
+                except Exception as e:
+                    logger.error(
+                        f"Error handling {event} from {self.url}: {e}", exc_info=True
+                    )
+        except ConnectionClosed:
+            logger.warning(f"Connection to {self.url} closed")
+
+    async def keep_alive(self):
+        """
+        Ping the pool with WebSocket control frames, which its library answers
+        without any JSON, to measure round-trip time. The interval doubles up
+        to PING_MAX_INTERVAL while round-trip times are steady and drops back
+        to PING_INTERVAL when one is not.
+        """
+        self.ping_interval = PING_INTERVAL
+        while True:
+            try:
+                pong_waiter = await self.websocket.ping()
+                sample = await asyncio.wait_for(pong_waiter, UPSTREAM_STALE_TIMEOUT)
+            except ConnectionClosed:
+                return
+            except asyncio.TimeoutError:
+                self.ping_interval = PING_INTERVAL
+            else:
+                self.last_seen = time.monotonic()
+                steady = self.rtt is not None and abs(sample - self.rtt) <= max(
+                    0.5 * self.rtt, 0.005
+                )
+                self.rtt = sample if self.rtt is None else 0.8 * self.rtt + 0.2 * sample
+                self.ping_interval = (
+                    min(self.ping_interval * 2, PING_MAX_INTERVAL)
+                    if steady
+                    else PING_INTERVAL
+                )
+            await asyncio.sleep(self.ping_interval)
+
+    async def close(self):
+        if self.websocket is not None:
+            await self.websocket.close()
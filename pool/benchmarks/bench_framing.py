@@ -0,0 +1,64 @@
+"""
+Compare the JSON and binary encodings of the pool <-> miner messages.
+
+For each message type prints the frame size in bytes and the encode and
+decode cost per message. Job hashes are random 256-bit values, so the JSON
+sizes match real 78-digit decimal integers.
+
+Usage: python -m benchmarks.bench_framing [iterations]
+"""
+
+import random
+import sys
+import time
+
+from src.helpers.framing import decode_message, encode_binary, encode_json
+
+SAMPLES = [
+    (
+        "height_changed",
+        {
+            "version": 536870912,
+            "prev_block": random.getrandbits(256),
+            "mrkl_root": random.getrandbits(256),
+            "timestamp": 1700000000,
+            "bits_difficulty": 0x17034219,
+            "job_id": 1234,
+        },
+    ),
+    ("range_assignment", {"start": 1431655765, "end": 2863311530}),
+    ("nonce_found", {"job_id": 1234, "nonce": 2980000001, "timestamp": 1700000042}),
+    ("ping", 17),
+    ("ping", "Ping back: 17"),
+    ("hello", {"miner_id": "9f2c4e1a7b3d4c6e8f0a1b2c3d4e5f60"}),
+]
+
+
+def time_per_call(function, argument, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(*argument)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(
+        f"{'message':<18} {'json B':>7} {'bin B':>6} "
+        f"{'json enc':>9} {'bin enc':>8} {'json dec':>9} {'bin dec':>8}  (us)"
+    )
+    for event, message in SAMPLES:
+        text = encode_json(event, message)
+        data = encode_binary(event, message)
+        assert decode_message(data) == decode_message(text)
+        print(
+            f"{event:<18} {len(text.encode()):>7} {len(data):>6} "
+            f"{time_per_call(encode_json, (event, message), iterations):>9.2f} "
+            f"{time_per_call(encode_binary, (event, message), iterations):>8.2f} "
+            f"{time_per_call(decode_message, (text,), iterations):>9.2f} "
+            f"{time_per_call(decode_message, (data,), iterations):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
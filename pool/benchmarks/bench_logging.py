@@ -0,0 +1,81 @@
+"""
+Measure the cost of a log call on the calling thread.
+
+Compares a synchronous StreamHandler (the previous setup) with the queue-based
+pipeline, with and without per-call-site rate limiting. With the rate limit
+on, records are timed both while they are written (a burst large enough that
+nothing is throttled) and while a single call site logging in a loop is
+throttled, where records are dropped by the filter before they are queued.
+Both rate-limited paths are checked against an overhead budget. Output goes
+to /dev/null so terminal speed does not skew the numbers.
+
+Usage: python -m benchmarks.bench_logging [iterations]
+"""
+
+import logging
+import os
+import sys
+import time
+
+from src.helpers.logger import setup_logger
+
+# Maximum acceptable cost of one INFO call on the hot path, in microseconds
+LOG_OVERHEAD_BUDGET_US = float(os.getenv("LOG_OVERHEAD_BUDGET_US", "10"))
+
+
+def time_calls(logger, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        logger.info(f"Assigned range {i} - {i + 1} to client")
+    elapsed = time.perf_counter() - start
+    # Let the writer thread catch up so its backlog does not slow the next case
+    for handler in logger.handlers:
+        while getattr(handler, "queue", None) is not None and not handler.queue.empty():
+            time.sleep(0.01)
+    return elapsed / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    devnull = open(os.devnull, "w")
+    sys.stderr, stderr = devnull, sys.stderr
+
+    sync_logger = logging.getLogger("bench.sync")
+    sync_logger.propagate = False
+    sync_handler = logging.StreamHandler(devnull)
+    sync_handler.setFormatter(
+        logging.Formatter(
+            "%(asctime)s - %(filename)-20s - %(lineno)4d - %(levelname)-8s - %(message)s"
+        )
+    )
+    sync_logger.addHandler(sync_handler)
+    sync_logger.setLevel(logging.INFO)
+
+    queued = setup_logger("bench.queued", rate_limit=0)
+    queued.propagate = False
+    written = setup_logger("bench.written", rate_burst=iterations)
+    written.propagate = False
+    limited = setup_logger("bench.limited")
+    limited.propagate = False
+
+    results = {
+        "synchronous StreamHandler": time_calls(sync_logger, iterations),
+        "queued": time_calls(queued, iterations),
+        "rate limited, written": time_calls(written, iterations),
+        "rate limited, throttled": time_calls(limited, iterations),
+    }
+    sys.stderr = stderr
+
+    for name, cost in results.items():
+        print(f"{name:<28} {cost:8.2f} us/call")
+    dropped = sum(getattr(h, "dropped", 0) for h in queued.handlers + written.handlers)
+    print(f"records dropped by full queue: {dropped}")
+
+    for name in ("rate limited, written", "rate limited, throttled"):
+        cost = results[name]
+        status = "within" if cost <= LOG_OVERHEAD_BUDGET_US else "OVER"
+        print(f"{name}: {cost:.2f} us, {status} budget of {LOG_OVERHEAD_BUDGET_US} us")
+
+
+if __name__ == "__main__":
+    main()
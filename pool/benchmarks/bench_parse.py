@@ -0,0 +1,92 @@
+"""
+Measure transaction and block parsing.
+
+Parses a block's worth of synthetic segwit transactions the way the template
+cache does (raw bytes in, txid, wtxid and weight out), once with full
+CTransaction objects and once with LazyTransaction, which only records field
+offsets and hashes byte slices. Then deserializes the whole block both ways.
+
+Usage: python -m benchmarks.bench_parse [block_bytes] [tx_size]
+"""
+
+import random
+import sys
+import time
+from io import BytesIO
+
+from benchmarks.fake_bitcoind import synthetic_transaction
+from test_framework.messages import (
+    CBlock,
+    LazyTransaction,
+    hash256,
+    ser_uint256,
+    tx_from_hex,
+)
+
+ROUNDS = 5
+
+
+def eager_ids(raw):
+    tx = tx_from_hex(raw.hex())
+    stripped = tx.serialize_without_witness()
+    return hash256(stripped), hash256(raw), tx.get_weight()
+
+
+def lazy_ids(raw):
+    tx = LazyTransaction(raw)
+    tx.rehash()
+    return ser_uint256(tx.sha256), hash256(raw), tx.get_weight()
+
+
+def best_of(function):
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    block_bytes = int(sys.argv[1]) if len(sys.argv) > 1 else 4_000_000
+    tx_size = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    rng = random.Random(1)
+    raws = [
+        bytes.fromhex(synthetic_transaction(rng, tx_size)["data"])
+        for _ in range(block_bytes // tx_size)
+    ]
+    block = CBlock()
+    block.vtx = [tx_from_hex(raw.hex()) for raw in raws]
+    block.hashMerkleRoot = block.calc_merkle_root()
+    raw_block = block.serialize()
+
+    eager, eager_time = best_of(lambda: [eager_ids(raw) for raw in raws])
+    lazy, lazy_time = best_of(lambda: [lazy_ids(raw) for raw in raws])
+    assert eager == lazy, "lazy parser computed different ids"
+
+    def deserialize(lazy):
+        parsed = CBlock()
+        parsed.deserialize(BytesIO(raw_block), lazy=lazy)
+        return parsed
+
+    _, eager_block_time = best_of(lambda: deserialize(False))
+    lazy_block, lazy_block_time = best_of(lambda: deserialize(True))
+    assert lazy_block.serialize() == raw_block
+    assert lazy_block.calc_merkle_root() == block.hashMerkleRoot
+
+    print(f"transactions:             {len(raws)}")
+    print(f"ids + weight, objects:    {eager_time * 1000:.1f} ms")
+    print(
+        f"ids + weight, lazy:       {lazy_time * 1000:.1f} ms "
+        f"({eager_time / lazy_time:.2f}x)"
+    )
+    print(f"block deserialize:        {eager_block_time * 1000:.1f} ms")
+    print(
+        f"block deserialize, lazy:  {lazy_block_time * 1000:.1f} ms "
+        f"({eager_block_time / lazy_block_time:.2f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Measure full-block serialization.
+
+Builds a block of synthetic segwit transactions and times serializing it
+with the streaming `serialize` (every field appended to one bytearray)
+against the previous implementation, which concatenated a new bytes object
+at every field and vector. Both must produce identical bytes.
+
+Usage: python -m benchmarks.bench_serialize [block_bytes] [tx_size]
+"""
+
+import random
+import sys
+import time
+
+from benchmarks.fake_bitcoind import synthetic_transaction
+from test_framework.messages import (
+    CBlock,
+    ser_compact_size,
+    ser_string,
+    ser_uint256,
+    tx_from_hex,
+)
+
+ROUNDS = 5
+
+
+def legacy_ser_vector(l, ser_function_name=None):
+    r = ser_compact_size(len(l))
+    for i in l:
+        if ser_function_name:
+            r += getattr(i, ser_function_name)()
+        else:
+            r += legacy_serialize(i)
+    return r
+
+
+def legacy_serialize(obj):
+    """The concatenating serializers of inputs, outputs and witnesses."""
+    if hasattr(obj, "prevout"):
+        r = ser_uint256(obj.prevout.hash) + obj.prevout.n.to_bytes(4, "little")
+        r += ser_string(obj.scriptSig)
+        r += obj.nSequence.to_bytes(4, "little")
+        return r
+    r = obj.nValue.to_bytes(8, "little", signed=True)
+    r += ser_string(obj.scriptPubKey)
+    return r
+
+
+def legacy_tx(tx):
+    flags = 1 if not tx.wit.is_null() else 0
+    r = b""
+    r += tx.nVersion.to_bytes(4, "little", signed=True)
+    if flags:
+        r += ser_compact_size(0)
+        r += flags.to_bytes(1, "little")
+    r += legacy_ser_vector(tx.vin)
+    r += legacy_ser_vector(tx.vout)
+    if flags:
+        for x in tx.wit.vtxinwit:
+            stack = x.scriptWitness.stack
+            w = ser_compact_size(len(stack))
+            for sv in stack:
+                w += ser_string(sv)
+            r += w
+    r += tx.nLockTime.to_bytes(4, "little")
+    return r
+
+
+def legacy_block(block):
+    r = b""
+    r += block.nVersion.to_bytes(4, "little", signed=True)
+    r += ser_uint256(block.hashPrevBlock)
+    r += ser_uint256(block.hashMerkleRoot)
+    r += block.nTime.to_bytes(4, "little")
+    r += block.nBits.to_bytes(4, "little")
+    r += block.nNonce.to_bytes(4, "little")
+    r += ser_compact_size(len(block.vtx))
+    for tx in block.vtx:
+        r += legacy_tx(tx)
+    return r
+
+
+def build_block(block_bytes, tx_size):
+    rng = random.Random(1)
+    block = CBlock()
+    block.nBits = 0x207FFFFF
+    block.nTime = int(time.time())
+    block.hashPrevBlock = rng.getrandbits(256)
+    for _ in range(block_bytes // tx_size):
+        block.vtx.append(tx_from_hex(synthetic_transaction(rng, tx_size)["data"]))
+    block.hashMerkleRoot = block.calc_merkle_root()
+    return block
+
+
+def timed(function, block):
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        data = function(block)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return data, best
+
+
+def main():
+    block_bytes = int(sys.argv[1]) if len(sys.argv) > 1 else 4_000_000
+    tx_size = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    block = build_block(block_bytes, tx_size)
+
+    legacy, legacy_time = timed(legacy_block, block)
+    streamed, streamed_time = timed(CBlock.serialize, block)
+    assert streamed == legacy, "streaming serializer changed the block bytes"
+    _, stripped_time = timed(lambda b: b.serialize(with_witness=False), block)
+
+    print(f"transactions:             {len(block.vtx)}")
+    print(f"block size:               {len(streamed) / 1e6:.2f} MB")
+    print(f"concatenating serialize:  {legacy_time * 1000:.1f} ms")
+    print(
+        f"streaming serialize:      {streamed_time * 1000:.1f} ms "
+        f"({legacy_time / streamed_time:.2f}x)"
+    )
+    print(f"streaming, no witness:    {stripped_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
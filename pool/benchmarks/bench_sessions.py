@@ -0,0 +1,91 @@
+"""
+Measure the memory held per connected miner and the cost of a broadcast.
+
+Builds N sessions the way the pool registers a miner (session, send queue
+with its idle writer task, timer wheel entry) around a stand-in socket and
+reports the traced bytes per session, plus the time to queue one job for
+every session. The WebSocket library's own per-connection state is not
+included.
+
+Usage: python -m benchmarks.bench_sessions [sessions]
+"""
+
+import asyncio
+import sys
+import time
+import tracemalloc
+
+from src.lib.liveness import LivenessMonitor
+from src.lib.outbox import Outbox
+from src.lib.session import Session
+
+# Sessions one pool process should hold
+TARGET_SESSIONS = 50000
+
+
+class FakeWebSocket:
+    subprotocol = None
+
+    async def send(self, data):
+        pass
+
+
+def traced(build):
+    """Return what `build` returns and the bytes it left allocated."""
+    before = tracemalloc.take_snapshot()
+    result = build()
+    after = tracemalloc.take_snapshot()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return result, size
+
+
+async def run(count):
+    sessions = {}
+    liveness = LivenessMonitor(sessions)
+    sockets = [FakeWebSocket() for _ in range(count)]
+
+    def build_sessions():
+        for websocket in sockets:
+            sessions[websocket] = Session(websocket, Outbox(websocket))
+
+    def start_writers():
+        for session in sessions.values():
+            liveness.add(session)
+            session.outbox.start()
+
+    tracemalloc.start()
+    _, session_bytes = traced(build_sessions)
+    _, writer_bytes = traced(start_writers)
+    await asyncio.sleep(0)
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for session in sessions.values():
+        session.outbox.put("job", "height_changed")
+    broadcast = time.perf_counter() - start
+
+    for session in sessions.values():
+        session.outbox.stop()
+    await asyncio.sleep(0)
+    return session_bytes / count, writer_bytes / count, broadcast
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    session_bytes, writer_bytes, broadcast = asyncio.run(run(count))
+    total = session_bytes + writer_bytes
+    print(f"sessions:                 {count}")
+    print(f"session + send queue:     {session_bytes:.0f} B/session")
+    print(f"writer task + wheel:      {writer_bytes:.0f} B/session")
+    print(
+        f"total:                    {total:.0f} B/session, "
+        f"{total * TARGET_SESSIONS / 2**20:.1f} MiB for {TARGET_SESSIONS} sessions"
+    )
+    print(
+        f"queue one job for all:    {broadcast * 1000:.2f} ms "
+        f"({broadcast / count * 1e6:.2f} us/session)"
+    )
+
+
+if __name__ == "__main__":
+    main()
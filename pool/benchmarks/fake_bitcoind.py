@@ -0,0 +1,281 @@
+"""
+Local stand-in for the Bitcoin Daemon JSON-RPC interface.
+
+Implements the methods the pool uses -- `getblockchaininfo`,
+`getbestblockhash`, `getblocktemplate` (including longpoll) and `submitblock` --
+on top of a synthetic regtest chain (`0x207fffff` difficulty), so the full
+pool -> miner -> submit loop can run and be benchmarked on a laptop.
+
+Templates are either synthetic, with a configurable number and size of
+transactions and a mempool that partially turns over on every new tip, or
+replayed from a file of recorded `getblocktemplate` results (one JSON object
+per line, e.g. `bitcoin-cli getblocktemplate '{"rules":["segwit"]}' | jq -c`).
+Submitted blocks are checked with the `test_framework` CBlock code and a valid
+block becomes the new tip. The tip can also advance on a fixed schedule.
+
+Usage: python -m benchmarks.fake_bitcoind --port 18443 --tx-count 800
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from test_framework.messages import (
+    CBlock,
+    COutPoint,
+    CTransaction,
+    CTxIn,
+    CTxInWitness,
+    CTxOut,
+    hash256,
+    uint256_from_compact,
+)
+
+REGTEST_BITS = "207fffff"
+# Target of 1, which no header meets: load tests submit nonces without finding blocks
+UNREACHABLE_BITS = "03000001"
+LONGPOLL_TIMEOUT = 60
+
+
+def synthetic_transaction(rng, size):
+    """A P2WPKH-shaped transaction padded to roughly `size` bytes."""
+    tx = CTransaction()
+    tx.vin = [CTxIn(COutPoint(rng.getrandbits(256), rng.randrange(4)), b"", 0xFFFFFFFD)]
+    tx.vout = [
+        CTxOut(rng.randrange(1000, 10**8), b"\x00\x14" + rng.randbytes(20))
+        for _ in range(2)
+    ]
+    tx.wit.vtxinwit = [CTxInWitness()]
+    tx.wit.vtxinwit[0].scriptWitness.stack = [rng.randbytes(72), rng.randbytes(33)]
+    # Pad with OP_RETURN outputs of up to 75 data bytes each
+    while len(tx.serialize()) + 12 < size:
+        n = min(size - len(tx.serialize()) - 11, 75)
+        tx.vout.append(CTxOut(0, b"\x6a" + bytes([n]) + rng.randbytes(n)))
+    tx.rehash()
+    return {
+        "data": tx.serialize().hex(),
+        "txid": tx.hash,
+        "hash": tx.getwtxid(),
+        "depends": [],
+        "fee": 1000,
+        "sigops": 1,
+        "weight": tx.get_weight(),
+    }
+
+
+class FakeBitcoind:
+    """A synthetic chain plus the RPC methods the pool uses."""
+
+    def __init__(
+        self,
+        start_height=100,
+        tx_count=0,
+        tx_size=250,
+        tx_churn=0.1,
+        replay=None,
+        seed=0,
+        bits=REGTEST_BITS,
+    ):
+        self.lock = threading.Condition()
+        self.rng = random.Random(seed)
+        self.bits = bits
+        self.height = start_height
+        self.tip = hash256(start_height.to_bytes(4, "little"))[::-1].hex()
+        self.tip_changed_at = {self.tip: time.time()}
+        self.tx_size = tx_size
+        self.tx_churn = tx_churn
+        self.mempool = [
+            synthetic_transaction(self.rng, tx_size) for _ in range(tx_count)
+        ]
+        self.replay = replay or []
+        self.replay_index = 0
+        self.submitted = []
+        self.accepted = []
+        self.rejected = []
+
+    def advance_tip(self, new_tip=None):
+        """Move the chain tip forward by one block (synthetic unless given)."""
+        with self.lock:
+            self.height += 1
+            self.tip = new_tip or hash256(self.height.to_bytes(4, "little"))[::-1].hex()
+            self.tip_changed_at[self.tip] = time.time()
+            self.replay_index += 1
+            churn = int(len(self.mempool) * self.tx_churn)
+            if churn:
+                del self.mempool[:churn]
+                self.mempool.extend(
+                    synthetic_transaction(self.rng, self.tx_size) for _ in range(churn)
+                )
+            self.lock.notify_all()
+            return self.tip
+
+    def run_schedule(self, interval):
+        """Advance the tip every `interval` seconds from a background thread."""
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.advance_tip()
+
+        threading.Thread(target=loop, name="tip-schedule", daemon=True).start()
+
+    def getblockchaininfo(self):
+        return {"chain": "regtest", "blocks": self.height, "bestblockhash": self.tip}
+
+    def getbestblockhash(self):
+        return self.tip
+
+    def getblocktemplate(self, request=None):
+        longpollid = (request or {}).get("longpollid")
+        with self.lock:
+            if longpollid is not None:
+                self.lock.wait_for(
+                    lambda: longpollid != self.tip, timeout=LONGPOLL_TIMEOUT
+                )
+            if self.replay:
+                tmpl = dict(self.replay[self.replay_index % len(self.replay)])
+            else:
+                tmpl = {
+                    "version": 0x20000000,
+                    "coinbasevalue": 5000000000 + 1000 * len(self.mempool),
+                    "transactions": list(self.mempool),
+                }
+            tmpl.update(
+                previousblockhash=self.tip,
+                height=self.height + 1,
+                curtime=int(time.time()),
+                bits=self.bits,
+                longpollid=self.tip,
+            )
+            return tmpl
+
+    def submitblock(self, block_hex):
+        """Validate a block with the test_framework code; a valid block becomes the tip."""
+        self.submitted.append(block_hex)
+        block = CBlock()
+        try:
+            block.deserialize(BytesIO(bytes.fromhex(block_hex)))
+        except Exception:
+            self.rejected.append("block decode failed")
+            return "rejected"
+        block.rehash()
+        if block.sha256 > uint256_from_compact(block.nBits):
+            reason = "high-hash"
+        elif not block.is_valid():
+            reason = "bad-txnmrklroot"
+        else:
+            reason = None
+        # Concurrent submissions of blocks on the same tip: only one may extend it
+        with self.lock:
+            if block.hash in self.tip_changed_at:
+                reason = "duplicate"
+            elif reason is None and f"{block.hashPrevBlock:064x}" != self.tip:
+                reason = "prev-blk-not-found"
+            if reason is not None:
+                self.rejected.append(reason)
+                return reason
+            self.accepted.append(block.hash)
+            self.advance_tip(block.hash)
+        return None
+
+    def dispatch(self, method, params):
+        if method not in (
+            "getblockchaininfo",
+            "getbestblockhash",
+            "getblocktemplate",
+            "submitblock",
+        ):
+            raise ValueError(f"Method not found: {method}")
+        return getattr(self, method)(*(params or []))
+
+
+class RPCRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        try:
+            result = self.server.bitcoind.dispatch(
+                request["method"], request.get("params")
+            )
+            response = {"id": request["id"], "result": result, "error": None}
+        except Exception as e:
+            response = {
+                "id": request["id"],
+                "result": None,
+                "error": {"code": -32601, "message": str(e)},
+            }
+        body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(bitcoind, host="127.0.0.1", port=0):
+    """Serve `bitcoind` over HTTP from a background thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), RPCRequestHandler)
+    server.daemon_threads = True
+    server.bitcoind = bitcoind
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def load_templates(path):
+    """Load recorded getblocktemplate results, one JSON object per line."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18443)
+    parser.add_argument("--tx-count", type=int, default=0)
+    parser.add_argument("--tx-size", type=int, default=250)
+    parser.add_argument(
+        "--tx-churn",
+        type=float,
+        default=0.1,
+        help="fraction of the mempool replaced on every new tip",
+    )
+    parser.add_argument(
+        "--tip-interval",
+        type=float,
+        default=0,
+        help="advance the tip every N seconds (0: only on submitblock)",
+    )
+    parser.add_argument("--replay", help="file of recorded templates to replay")
+    args = parser.parse_args()
+
+    bitcoind = FakeBitcoind(
+        tx_count=args.tx_count,
+        tx_size=args.tx_size,
+        tx_churn=args.tx_churn,
+        replay=load_templates(args.replay) if args.replay else None,
+    )
+    server = serve(bitcoind, args.host, args.port)
+    if args.tip_interval:
+        bitcoind.run_schedule(args.tip_interval)
+    print(f"Fake bitcoind listening on {args.host}:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(10)
+            print(
+                f"height {bitcoind.height}, submitted {len(bitcoind.submitted)}, "
+                f"accepted {len(bitcoind.accepted)}, rejected {len(bitcoind.rejected)}"
+            )
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
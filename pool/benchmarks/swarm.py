@@ -0,0 +1,354 @@
+"""
+Simulated miner swarm for load-testing the pool.
+
+Starts a fake Bitcoin Daemon, launches the pool (`main.py`) as a subprocess
+pointed at it, and opens thousands of lightweight WebSocket clients that speak
+the same protocol as the miner's ConnectionManager: a `ping` every 5 seconds,
+accepting `range_assignment` and `height_changed`, and sending synthetic
+`nonce_found` messages at a configurable rate, which never meet the fake
+node's target. The tip is advanced on a schedule and every client records
+when each job arrives.
+
+Reported: tip change -> job arrival latency percentiles, the pool's CPU and
+memory, and connections dropped before the end of the run.
+
+`--net-profile compare` runs the swarm twice, with NET_PROFILE=default and
+NET_PROFILE=fast on both the pool and the clients, and reports both.
+
+Usage: python -m benchmarks.swarm --clients 2000 --tips 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import websockets
+
+from benchmarks.fake_bitcoind import UNREACHABLE_BITS, FakeBitcoind, serve
+from src.helpers.netprofile import FAST_PROFILE_OPTIONS
+
+POOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def simulated_miner(
+    url, deadline, window, nonce_rate, arrivals, stats, connect_gate, options
+):
+    """One miner: connect, keep alive, record job arrivals, send synthetic nonces."""
+
+    def count_in_window():
+        if window[0] <= time.time() < window[1]:
+            stats["window_messages"] += 1
+
+    async with connect_gate:
+        try:
+            websocket = await websockets.connect(url, open_timeout=30, **options)
+        except Exception:
+            stats["failed"] += 1
+            return
+    stats["connected"] += 1
+    job = None
+
+    async def keep_alive():
+        while True:
+            await asyncio.sleep(5)
+            await websocket.send(json.dumps({"event": "ping", "message": 1}))
+            count_in_window()
+
+    async def submit_nonces():
+        while True:
+            await asyncio.sleep(random.expovariate(nonce_rate))
+            if job is not None:
+                solution = {
+                    "job_id": job.get("job_id"),
+                    "nonce": random.getrandbits(32),
+                    "timestamp": job["timestamp"],
+                }
+                await websocket.send(
+                    json.dumps({"event": "nonce_found", "message": solution})
+                )
+                stats["nonces"] += 1
+                count_in_window()
+
+    tasks = [asyncio.create_task(keep_alive())]
+    if nonce_rate > 0:
+        tasks.append(asyncio.create_task(submit_nonces()))
+    try:
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            raw = await asyncio.wait_for(websocket.recv(), remaining)
+            received = time.time()
+            message = json.loads(raw)
+            stats["messages"] += 1
+            count_in_window()
+            if message["event"] == "height_changed":
+                job = message["message"]
+                arrivals.append((f"{job['prev_block']:064x}", received))
+    except asyncio.TimeoutError:
+        pass
+    except websockets.ConnectionClosed:
+        stats["dropped"] += 1
+    finally:
+        for task in tasks:
+            task.cancel()
+        await websocket.close()
+
+
+def run_clients(url, count, deadline, window, nonce_rate, connect_concurrency, fast):
+    """Run `count` simulated miners in this process until the deadline."""
+    raise_fd_limit()
+    options = dict(FAST_PROFILE_OPTIONS) if fast else {}
+    if fast:
+        try:
+            import uvloop
+
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        except ImportError:
+            pass
+
+    async def run():
+        arrivals = []
+        stats = {
+            "connected": 0,
+            "failed": 0,
+            "dropped": 0,
+            "messages": 0,
+            "nonces": 0,
+            "window_messages": 0,
+        }
+        gate = asyncio.Semaphore(connect_concurrency)
+        await asyncio.gather(
+            *[
+                simulated_miner(
+                    url, deadline, window, nonce_rate, arrivals, stats, gate, options
+                )
+                for _ in range(count)
+            ]
+        )
+        return arrivals, stats
+
+    return asyncio.run(run())
+
+
+def process_tree(pid):
+    """Return the pid and the pids of all its descendants."""
+    pids = [pid]
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            for child in f.read().split():
+                pids.extend(process_tree(int(child)))
+    return pids
+
+
+def process_usage(pid):
+    """Return (cpu_seconds, rss_bytes) of a process and its children from /proc."""
+    cpu = 0.0
+    rss = 0
+    for member in process_tree(pid):
+        with open(f"/proc/{member}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        with open(f"/proc/{member}/status") as f:
+            rss += next(int(line.split()[1]) for line in f if line.startswith("VmRSS"))
+    return cpu, rss * 1024
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def free_port():
+    """A TCP port that is free on localhost right now."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_swarm(args, profile):
+    """Run one swarm against a fresh pool and return the aggregated results."""
+    # The pool keeps its state and ports apart from any real pool on this host
+    state_dir = tempfile.TemporaryDirectory(prefix="swarm-")
+    # Synthetic nonces must never solve a block, or the tip would move with
+    # every lucky nonce instead of on the schedule
+    bitcoind = FakeBitcoind(tx_count=args.tx_count, bits=UNREACHABLE_BITS)
+    rpc_server = serve(bitcoind)
+    env = dict(
+        os.environ,
+        RPC_URL=f"http://127.0.0.1:{rpc_server.server_address[1]}",
+        RPC_USER="swarm",
+        RPC_PASS="swarm",
+        MINER_PUBLIC_KEY="bcrt1qaj88xpedvteetelgnqy3h49mtl48p6l3n4g2t7",
+        CHECK_INTERVAL=str(args.check_interval),
+        METRICS_PORT="0",
+        VERIFY_SUBMITTED_BLOCKS="0",
+        NET_PROFILE=profile,
+        PORT=str(args.port),
+        STRATUM_PORT=str(free_port()),
+        SNAPSHOT_PATH=os.path.join(state_dir.name, "pool-state.snapshot"),
+        POOL_IPC_PATH=os.path.join(state_dir.name, "coordinator.sock"),
+    )
+    env.update(item.split("=", 1) for item in args.pool_env)
+    pool = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=POOL_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    time.sleep(2)
+
+    url = f"ws://127.0.0.1:{args.port}"
+    ramp_up = args.ramp_up or 5 + args.clients / 100
+    duration = ramp_up + args.tips * args.tip_interval + 2
+    deadline = time.time() + duration
+    # Messages in either direction are counted while pool CPU is being measured
+    window = (deadline - duration + ramp_up, deadline - 2)
+    per_process = [args.clients // args.processes] * args.processes
+    per_process[-1] += args.clients - sum(per_process)
+
+    try:
+        with ProcessPoolExecutor(max_workers=args.processes) as executor:
+            futures = [
+                executor.submit(
+                    run_clients,
+                    url,
+                    count,
+                    deadline,
+                    window,
+                    args.nonce_rate,
+                    args.connect_concurrency,
+                    profile == "fast",
+                )
+                for count in per_process
+                if count
+            ]
+            time.sleep(ramp_up)
+            cpu_start, _ = process_usage(pool.pid)
+            measure_start = time.time()
+            measured_tips = set()
+            for _ in range(args.tips):
+                measured_tips.add(bitcoind.advance_tip())
+                time.sleep(args.tip_interval)
+            cpu_end, rss = process_usage(pool.pid)
+            measure_time = time.time() - measure_start
+            results = [future.result() for future in futures]
+    finally:
+        pool.terminate()
+        pool.wait()
+        rpc_server.shutdown()
+        state_dir.cleanup()
+
+    latencies = []
+    stats = {}
+    for arrivals, client_stats in results:
+        for key, value in client_stats.items():
+            stats[key] = stats.get(key, 0) + value
+        for tip, received in arrivals:
+            if tip in measured_tips:
+                latencies.append(received - bitcoind.tip_changed_at[tip])
+    latencies.sort()
+    expected = args.tips * stats["connected"]
+
+    return {
+        "stats": stats,
+        "latencies": latencies,
+        "expected": expected,
+        "cpu": cpu_end - cpu_start,
+        "measure_time": measure_time,
+        "rss": rss,
+    }
+
+
+def report(profile, result):
+    stats = result["stats"]
+    latencies = result["latencies"]
+    print(f"NET_PROFILE={profile}")
+    print(f"clients connected:   {stats['connected']} ({stats['failed']} failed)")
+    print(f"connections dropped: {stats['dropped']}")
+    print(f"jobs received:       {len(latencies)} of {result['expected']}")
+    print(f"messages received:   {stats['messages']}, nonces sent: {stats['nonces']}")
+    print("tip change -> job latency (includes up to CHECK_INTERVAL of polling):")
+    for label, fraction in (("p50", 0.5), ("p99", 0.99), ("p99.9", 0.999)):
+        print(f"  {label:<6} {percentile(latencies, fraction) * 1000:9.2f} ms")
+    print(f"pool CPU:            {result['cpu'] / result['measure_time'] * 100:.1f}%")
+    print(
+        f"pool CPU / message:  {result['cpu'] / max(stats['window_messages'], 1) * 1e6:.1f} us"
+    )
+    print(f"pool RSS:            {result['rss'] / 2**20:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=max(os.cpu_count() - 1, 1))
+    parser.add_argument("--tips", type=int, default=10, help="tip changes to measure")
+    parser.add_argument("--tip-interval", type=float, default=3.0)
+    parser.add_argument(
+        "--nonce-rate",
+        type=float,
+        default=0.0,
+        help="synthetic nonce_found messages per client per second",
+    )
+    parser.add_argument(
+        "--check-interval",
+        type=float,
+        default=0.05,
+        help="pool CHECK_INTERVAL; bounds the polling share of latency",
+    )
+    parser.add_argument(
+        "--tx-count", type=int, default=0, help="transactions per template"
+    )
+    parser.add_argument(
+        "--ramp-up",
+        type=float,
+        help="seconds to let connections settle before measuring "
+        "(default: 5 + clients / 100)",
+    )
+    parser.add_argument("--connect-concurrency", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--pool-env",
+        action="append",
+        default=[],
+        help="extra KEY=VALUE environment for the pool process",
+    )
+    parser.add_argument(
+        "--net-profile",
+        choices=("default", "fast", "compare"),
+        default="default",
+        help="NET_PROFILE for the pool and the clients, or run both and compare",
+    )
+    args = parser.parse_args()
+
+    if args.net_profile == "compare":
+        profiles = ["default", "fast"]
+    else:
+        profiles = [args.net_profile]
+    for i, profile in enumerate(profiles):
+        if i:
+            print()
+            time.sleep(2)
+        report(profile, run_swarm(args, profile))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,75 +6,222 @@ load_dotenv()
 
 import asyncio
 import json
+import math
+import signal
+import time
+from io import BytesIO
+from urllib.parse import parse_qs
 from concurrent.futures import ThreadPoolExecutor
 import websockets
 import os
-from src.helpers.btc_util import create_mining_block, get_mining_template
-from src.lib.rpc import publish_block, rpc_getblockchaininfo, rpc_getblocktemplate
+from src.helpers.btc_util import (
+    DIFF1_TARGET,
+    EXTRANONCE_SIZE,
+    MAX_TEMPLATE_TXS,
+    build_header,
+    check_header_pow,
+    create_mining_block,
+    verify_block_consistency,
+)
+from src.lib.inform import inform_me, notifier
+from src.lib.jobs import JobRing
+from src.lib.liveness import LivenessMonitor
+from src.lib.metrics import (
+    BROADCAST_LATENCY,
+    CONNECTED_CLIENTS,
+    METRICS_PORT,
+    ROUTES,
+    LOOP_LAG,
+    NONCES_RECEIVED,
+    SOLUTIONS_DUPLICATE,
+    SOLUTIONS_INVALID,
+    SOLUTIONS_STALE,
+    SOLUTIONS_VALID,
+    SUBMISSION_LATENCY,
+    TEMPLATE_BUILD_TIME,
+    start_metrics_server,
+)
+from src.lib.outbox import Outbox
+from src.lib.rpc import rpc_getblockchaininfo, rpc_getblocktemplate
+from src.lib.shard import (
+    POOL_WORKERS,
+    CoordinatorLink,
+    FrontendLink,
+    start_coordinator_server,
+    start_frontends,
+    supervise_frontends,
+)
+from src.lib.session import Session
+from src.lib.snapshot import ResumeTable, SnapshotStore, load_block
+from src.lib.stratum import STRATUM_PORT, StratumServer
+from src.lib.submitter import BlockSubmitter
+from src.lib.txcache import TxCache
+from src.helpers.framing import (
+    BINARY_SUBPROTOCOL,
+    decode_message,
+    encode_binary,
+    encode_for,
+    encode_json,
+)
 from src.helpers.logger import logger
+from src.helpers.merkle import MerkleTree
+from src.helpers.netprofile import (
+    fast_profile,
+    install_event_loop,
+    server_options,
+    set_nodelay,
+)
 from src.helpers.setup import setup_environment
+from src.helpers.watchdog import (
+    PROFILE_ENDPOINT,
+    PROFILE_MAX_SECONDS,
+    PROFILE_SECONDS,
+    LoopWatchdog,
+    SamplingProfiler,
+)
+from test_framework.messages import CBlock, ser_uint256
+
+# Run the full merkle/transaction check on submitted blocks in a worker thread
+VERIFY_SUBMITTED_BLOCKS = os.getenv("VERIFY_SUBMITTED_BLOCKS", "1") == "1"
+# WebSocket server port
+PORT = int(os.getenv("PORT", "8765"))
+
+# Seconds between blockchain height checks
+CHECK_INTERVAL = float(os.getenv("CHECK_INTERVAL", "5"))
+# Rebuild the template at the same height every N seconds (0 disables)
+TEMPLATE_REFRESH_INTERVAL = float(os.getenv("TEMPLATE_REFRESH_INTERVAL", "0"))
+
+
+def is_valid_nonce_message(message):
+    """
+    Check the fields of a nonce_found message before it is forwarded or validated.
+    Nonce and timestamp must fit the 32-bit header fields they are packed into.
+    """
+    if not isinstance(message, dict):
+        return False
+    nonce = message.get("nonce")
+    timestamp = message.get("timestamp")
+    extranonce = message.get("extranonce", 0)
+    return (
+        isinstance(nonce, int)
+        and 0 <= nonce < 2**32
+        and isinstance(timestamp, int)
+        and 0 <= timestamp < 2**32
+        and isinstance(extranonce, int)
+        and 0 <= extranonce < 2 ** (8 * EXTRANONCE_SIZE)
+    )
 
 
 class ConnectionManager:
     def __init__(self):
         """Initialize connection manager with required attributes."""
-        self.connected_clients = set()
+        self.sessions = {}
         self.current_height = None
-        self.block = None
+        self.jobs = JobRing()
         self.executor = ThreadPoolExecutor()
         self.start = 0
         self.end = 4294967296
         self.mining_info = None
+        self.template_time = 0
+        self.submitter = BlockSubmitter(on_result=self.handle_submit_result)
+        self.snapshots = SnapshotStore()
+        self.resume = None
+        self.stratum = None
+        self.liveness = LivenessMonitor(self.sessions)
+        self.tx_cache = TxCache()
+        # Txid and witness trees of the latest template, updated in place
+        self.merkle_trees = (MerkleTree(), MerkleTree())
 
     async def register(self, websocket):
-        """Register a new WebSocket client."""
-        self.connected_clients.add(websocket)
-        logger.info(f"Client connected. Total clients: {len(self.connected_clients)}")
+        """Register a new WebSocket client and return its session."""
+        outbox = Outbox(websocket)
+        session = self.sessions[websocket] = Session(websocket, outbox)
+        outbox.start()
+        self.liveness.add(session)
+        logger.info(f"Client connected. Total clients: {len(self.sessions)}")
+        return session
 
     async def unregister(self, websocket):
         """Unregister a WebSocket client when disconnected."""
-        if websocket in self.connected_clients:
-            self.connected_clients.remove(websocket)
-            logger.info(
-                f"Client disconnected. Total clients: {len(self.connected_clients)}"
-            )
-
-    async def send_message(self, websocket, event, message):
-        """Send a JSON message to a specific WebSocket client."""
-        message_json = json.dumps({"event": event, "message": message})
-        await websocket.send(message_json)
+        session = self.sessions.pop(websocket, None)
+        if session is not None:
+            session.outbox.stop()
+            self.liveness.remove(session)
+            if self.resume is not None and session.miner_id and session.assigned_range:
+                self.resume.release(session.miner_id, session.assigned_range)
+            logger.info(f"Client disconnected. Total clients: {len(self.sessions)}")
+
+    async def send_message(self, session, event, message):
+        """
+        Send a message to a specific client in its negotiated format. Miners
+        get it through their send queue; other clients are written directly.
+        """
+        data = encode_for(session.websocket, event, message)
+        if session.outbox is None:
+            await session.websocket.send(data)
+        else:
+            session.outbox.put(data, event)
 
     async def send_message_to_all(self, event, message):
-        """Broadcast a JSON message to all connected clients."""
-        if self.connected_clients:
-            message_json = json.dumps({"event": event, "message": message})
-            await asyncio.gather(
-                *[client.send(message_json) for client in self.connected_clients]
-            )
+        """Broadcast a message to all connected clients."""
+        if self.sessions:
+            message_json = encode_json(event, message)
+            await self.broadcast(message_json, encode_binary(event, message), event)
+
+    async def broadcast(self, message_json, message_binary=None, event=None):
+        """
+        Send an already encoded message to all connected clients. Queueing for
+        miners does not wait, so only clients without a send queue are awaited.
+        :param message_binary: Binary encoding for clients that negotiated it.
+        :param event: Event of the message, so a queued older job can be replaced.
+        """
+        if message_binary is None:
+            message_binary = message_json
+        with BROADCAST_LATENCY.time():
+            direct = []
+            for session in self.sessions.values():
+                data = message_binary if session.binary else message_json
+                if session.outbox is None:
+                    direct.append(session.websocket.send(data))
+                else:
+                    session.outbox.put(data, event)
+            if direct:
+                await asyncio.gather(*direct)
 
     async def handle_client(self, websocket, path):
         """Handle incoming WebSocket connections."""
-        await self.register(websocket)
-        if self.mining_info is not None:
-            logger.info(f"Sending mining info to {len(self.connected_clients)} clients")
+        if fast_profile():
+            set_nodelay(websocket)
+        session = await self.register(websocket)
+        # While resuming, work is sent once the miner has identified itself
+        if self.mining_info is not None and self.resume is None:
+            logger.info(f"Sending mining info to {len(self.sessions)} clients")
             await self.divide_range_among_clients()
-            await self.send_message(websocket, "height_changed", self.mining_info)
+            await self.send_message(session, "height_changed", self.mining_info)
+
+        # Event handler mapping
+        event_handler = {
+            "hello": self.hello,
+            "nonce_found": self.handle_nonce_found,
+            "ping": self.ping,
+        }
 
         try:
             async for message in websocket:
-                message_data = json.loads(message)
-                event = message_data.get("event")
-                msg_content = message_data.get("message")
+                session.last_active = time.monotonic()
+                event, msg_content = decode_message(message)
 
-                # Event handler mapping
-                event_handler = {
-                    "nonce_found": self.handle_nonce_found,
-                    "ping": self.ping,
-                }
+                if (
+                    self.resume is not None
+                    and event != "hello"
+                    and session.assigned_range is None
+                ):
+                    # A miner that does not identify itself cannot resume
+                    await self.end_resume()
 
                 handler = event_handler.get(event)
                 if handler:
-                    await handler(websocket, msg_content)
+                    await handler(session, msg_content)
                 else:
                     logger.warning(f"Received unknown event: {event}")
 
@@ -92,20 +239,42 @@ class ConnectionManager:
                 )
                 height = blockchain_info.get("blocks")
 
-                if height is not None and height != self.current_height:
+                refresh_due = (
+                    TEMPLATE_REFRESH_INTERVAL > 0
+                    and time.monotonic() - self.template_time
+                    >= TEMPLATE_REFRESH_INTERVAL
+                )
+                if height is not None and (
+                    height != self.current_height or refresh_due
+                ):
+                    if height != self.current_height:
+                        logger.info(f"Blockchain height changed to {height}")
                     self.current_height = height
                     tmpl = await asyncio.get_event_loop().run_in_executor(
                         self.executor, rpc_getblocktemplate
                     )
-                    block = create_mining_block(tmpl)
-                    self.block = block
-
-                    mining_info = get_mining_template(block)
-                    self.mining_info = mining_info
-
-                    logger.info(f"Blockchain height changed to {height}")
+                    with TEMPLATE_BUILD_TIME.time():
+                        txs = self.tx_cache.lookup(
+                            tmpl["transactions"][:MAX_TEMPLATE_TXS]
+                        )
+                        block = create_mining_block(tmpl, txs, self.merkle_trees)
+                        previous = self.jobs.current
+                        job = self.jobs.create(height, block, txs, self.merkle_trees[0])
+                    self.mining_info = job.mining_info
+                    self.template_time = time.monotonic()
+                    # Every client gets a fresh range with the new job
+                    self.resume = None
+                    self.snapshots.mark_dirty()
+
+                    logger.info(f"Created job {job.job_id} at height {height}")
+
+                    if self.stratum is not None:
+                        self.stratum.notify(
+                            job,
+                            previous is None or previous.prev_block != job.prev_block,
+                        )
 
-                    if self.connected_clients:
+                    if self.sessions:
                         logger.info("Sending new mining block template to clients")
                         await self.divide_range_among_clients()
                         await self.send_message_to_all(
@@ -116,35 +285,243 @@ class ConnectionManager:
 
             except Exception as e:
                 logger.error(f"Error while checking blockchain API: {e}")
+                inform_me(f"Error while checking blockchain API: {e}", key="rpc_error")
 
-            await asyncio.sleep(5)  # Wait before next API check
+            await asyncio.sleep(CHECK_INTERVAL)  # Wait before next API check
 
-    async def handle_nonce_found(self, websocket, message):
+    async def handle_nonce_found(self, session, message):
         """Process a found nonce from a client."""
-        nonce = message.get("nonce")
-        timestamp = message.get("timestamp")
-
-        if nonce is not None:
-            logger.info(f"Received valid nonce from client: {message}")
-            self.block.nNonce = nonce
-            self.block.nTime = timestamp
-            self.block.rehash()
-
-            if self.block.is_valid():
-                logger.info("Block is valid and ready for submission")
-                publish_block(self.block, self.current_height)
-            else:
-                logger.warning(f"Invalid nonce received: {message}")
-        else:
+        received_at = time.perf_counter()
+        NONCES_RECEIVED.inc()
+        if not is_valid_nonce_message(message):
             logger.warning("Received invalid nonce message")
+            await self.send_message(session, "error", "Invalid nonce message")
+            return
+
+        self.check_solution(
+            session,
+            message.get("job_id"),
+            message.get("extranonce", 0),
+            message["timestamp"],
+            message["nonce"],
+            received_at,
+        )
+
+    def check_solution(
+        self,
+        session,
+        job_id,
+        extranonce,
+        timestamp,
+        nonce,
+        received_at=None,
+        share_target=None,
+    ):
+        """
+        Validate a solution from any front-end and submit it if it solves a block.
+        :param session: Session of the client, for its solution counters.
+        :param job_id: Job the solution was found for; None means the current job.
+        The header always carries the job's version, as version rolling is not supported.
+        :param share_target: Easier target for shares that do not solve a block.
+        :return: "block", "share", "stale", "duplicate" or "invalid".
+        """
+        job = self.jobs.get(job_id)
+        if job is None or self.jobs.is_stale(job):
+            SOLUTIONS_STALE.inc()
+            logger.warning(f"Stale solution rejected for job {job_id}")
+            return "stale"
+
+        # Repeats are rejected before any hashing
+        key = job.solution_key(extranonce, timestamp, nonce)
+        if job.is_duplicate(key):
+            SOLUTIONS_DUPLICATE.inc()
+            session.duplicates += 1
+            logger.warning(
+                f"Duplicate solution rejected ({session.duplicates} from client)"
+            )
+            return "duplicate"
+
+        # Stage one: only the 80-byte header is hashed before submission
+        block = job.block
+        extranonce_bytes = extranonce.to_bytes(EXTRANONCE_SIZE, "big")
+        header = build_header(
+            job.header_prefix_for(extranonce_bytes), timestamp, block.nBits, nonce
+        )
+        valid, header_hash = check_header_pow(header, job.target)
+        share = not valid and share_target is not None and header_hash <= share_target
+        if not valid and not share:
+            SOLUTIONS_INVALID.inc()
+            logger.warning(f"Invalid nonce {nonce} received for job {job.job_id}")
+            return "invalid"
+
+        # Only solutions that passed the proof-of-work check are remembered,
+        # so junk submissions cannot fill the job's seen set
+        job.record_solution(key)
+        session.credit(session.difficulty or DIFF1_TARGET / job.target)
+        if share:
+            return "share"
+
+        SOLUTIONS_VALID.inc()
+        block_hash = ser_uint256(header_hash)[::-1].hex()
+        block_tail = job.block_tail_for(extranonce_bytes)
+        self.submitter.submit(
+            header,
+            block_tail,
+            job.height,
+            block_hash,
+            received_at or time.perf_counter(),
+        )
+
+        # Stage two: full consistency check of the bytes that were submitted,
+        # off the event loop
+        if VERIFY_SUBMITTED_BLOCKS:
+            asyncio.get_event_loop().run_in_executor(
+                self.executor,
+                self.verify_submitted_block,
+                header,
+                block_tail,
+                block_hash,
+            )
+        return "block"
+
+    def handle_submit_result(self, height, block_hash, result, error, latency):
+        """Record the outcome of a block submission; notifications run off the loop."""
+        SUBMISSION_LATENCY.observe(latency)
+        if error is not None:
+            logger.error(f"Failed to submit block {block_hash}: {error}")
+            text = f"Error submitting block: {error}"
+        elif result is not None:
+            logger.warning(f"Block {block_hash} rejected: {result}")
+            text = f"Block Rejected\nBlock Height: {height}\nReason: {result}"
+        else:
+            logger.info(
+                f"Block {block_hash} submitted {latency * 1000:.2f} ms after nonce received"
+            )
+            text = f"Block Mined\nBlock Height: {height}\nBlock Hash: {block_hash}"
+        inform_me(text)
+
+    def verify_submitted_block(self, header, block_tail, block_hash):
+        """
+        Parse the submitted block and run its full consistency check in a worker thread.
+        :param header: The 80-byte header that was submitted.
+        :param block_tail: Hex of the submitted transaction vector.
+        """
+        stream = BytesIO(header + bytes.fromhex(block_tail))
+        block = CBlock()
+        try:
+            block.deserialize(stream)
+        except Exception as e:
+            logger.error(f"Submitted block {block_hash} could not be parsed: {e}")
+            return
+        block.rehash()
+        if (
+            block.hash == block_hash
+            and not stream.read()
+            and verify_block_consistency(block)
+        ):
+            logger.info(f"Submitted block {block_hash} passed full consistency check")
+        else:
+            logger.error(f"Submitted block {block_hash} failed full consistency check")
 
-    async def ping(self, websocket, message):
+    async def ping(self, session, message):
         """Respond to ping messages from clients."""
-        await self.send_message(websocket, "ping", f"Ping back: {message}")
+        await self.send_message(session, "ping", f"Ping back: {message}")
+
+    async def hello(self, session, message):
+        """Record a miner's identity and hand back its range after a restart."""
+        miner_id = message.get("miner_id") if isinstance(message, dict) else None
+        if not isinstance(miner_id, str) or not miner_id:
+            logger.warning(f"Received invalid hello message: {message}")
+            return
+        session.miner_id = miner_id
+        if self.resume is None or session.assigned_range is not None:
+            self.snapshots.mark_dirty()
+            return
+
+        assigned = self.resume.claim(miner_id)
+        if assigned is None:
+            await self.end_resume()
+            return
+        start, end = assigned
+        session.assigned_range = assigned
+        await self.send_message(
+            session, "range_assignment", {"start": start, "end": end}
+        )
+        await self.send_message(session, "height_changed", self.mining_info)
+        logger.info(f"Resumed range {start} - {end} for miner {miner_id}")
+        if self.resume.done():
+            await self.end_resume()
+
+    async def end_resume(self):
+        """
+        Stop holding restored ranges. Unless every one was reclaimed, the
+        range is divided again and miners still waiting are sent the job.
+        """
+        table, self.resume = self.resume, None
+        if table is None:
+            return
+        waiting = [
+            session
+            for session in self.sessions.values()
+            if session.assigned_range is None
+        ]
+        if table.ranges or waiting:
+            await self.divide_range_among_clients()
+            for session in waiting:
+                await self.send_message(session, "height_changed", self.mining_info)
+        logger.info("Finished resuming ranges from snapshot")
+
+    async def expire_resume(self):
+        while self.resume is not None:
+            await asyncio.sleep(max(self.resume.deadline - time.monotonic(), 0.1))
+            if self.resume is not None and self.resume.done():
+                await self.end_resume()
+
+    def saved_ranges(self):
+        """Ranges of identified miners, keyed by miner id, for the snapshot."""
+        return {
+            session.miner_id: session.assigned_range
+            for session in self.sessions.values()
+            if session.miner_id and session.assigned_range
+        }
+
+    async def restore_snapshot(self):
+        """Reload the jobs and ranges saved before a restart if the tip has not moved."""
+        state = self.snapshots.load()
+        if state is None:
+            return
+        try:
+            blockchain_info = await asyncio.get_event_loop().run_in_executor(
+                self.executor, rpc_getblockchaininfo
+            )
+        except Exception as e:
+            logger.warning(f"Could not check snapshot against the chain tip: {e}")
+            return
+        if (
+            blockchain_info.get("blocks") != state["height"]
+            or blockchain_info.get("bestblockhash") != state["tip"]
+        ):
+            logger.info("Snapshot is for an earlier chain tip, starting cold")
+            return
+
+        jobs = [
+            (job_id, height, load_block(raw)) for job_id, height, raw in state["jobs"]
+        ]
+        self.jobs.restore(jobs, state["current"], state["next_id"])
+        self.current_height = state["height"]
+        self.mining_info = self.jobs.current.mining_info
+        self.template_time = time.monotonic() - (time.time() - state["saved_at"])
+        if state["ranges"]:
+            self.resume = ResumeTable(state["ranges"])
+            asyncio.create_task(self.expire_resume())
+        logger.info(
+            f"Restored {len(jobs)} jobs at height {self.current_height} and "
+            f"{len(state['ranges'])} miner ranges from snapshot"
+        )
 
     async def divide_range_among_clients(self):
         """Distribute the mining nonce search range among connected clients."""
-        num_clients = len(self.connected_clients)
+        num_clients = len(self.sessions)
         if num_clients == 0:
             return
 
@@ -162,29 +539,267 @@ class ConnectionManager:
             client_ranges.append((current_start, current_end))
             current_start = current_end
 
-        clients = list(self.connected_clients)
-        for i, client in enumerate(clients):
-            start, end = client_ranges[i]
+        for session, (start, end) in zip(list(self.sessions.values()), client_ranges):
+            session.assigned_range = (start, end)
             await self.send_message(
-                client, "range_assignment", {"start": start, "end": end}
+                session, "range_assignment", {"start": start, "end": end}
             )
             logger.info(f"Assigned range {start} - {end} to client")
+        self.snapshots.mark_dirty()
+
+
+class ShardCoordinator(ConnectionManager):
+    """
+    Coordinator of a sharded pool: owns RPC, templates, range allocation and
+    solution validation. Its "clients" are front-end worker links; each job is
+    encoded once and the same bytes are written to every front-end.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.next_link_id = 0
+
+    async def handle_frontend(self, reader, writer):
+        """Serve one front-end worker connection."""
+        self.next_link_id += 1
+        link = FrontendLink(self.next_link_id, reader, writer)
+        session = self.sessions[link] = Session(link)
+        logger.info(f"Front-end {link.link_id} connected")
+        if self.mining_info is not None:
+            await self.send_message(session, "height_changed", self.mining_info)
+
+        try:
+            async for kind, payload in link.frames():
+                # A bad frame is dropped; it must not take the front-end's
+                # miners down with the link
+                try:
+                    await self.handle_frame(link, kind, payload)
+                except ConnectionError:
+                    raise
+                except Exception as e:
+                    logger.error(
+                        f"Error handling {kind} frame from front-end {link.link_id}: {e}"
+                    )
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions.pop(link, None)
+            logger.warning(f"Front-end {link.link_id} disconnected")
+            await self.divide_range_among_clients()
+
+    async def handle_frame(self, link, kind, payload):
+        if kind == "clients":
+            link.client_count = int(payload)
+            await self.divide_range_among_clients()
+        elif kind == "solution":
+            data = json.loads(payload)
+            client_id = data.get("client") if isinstance(data, dict) else None
+            if not isinstance(client_id, int):
+                logger.warning(f"Invalid solution frame from front-end {link.link_id}")
+                return
+            message = data.get("message")
+            if not is_valid_nonce_message(message):
+                # Front-ends reply to their miners, so this frame was forged
+                logger.warning(f"Invalid solution frame from front-end {link.link_id}")
+                return
+            client = link.clients.get(client_id)
+            if client is None:
+                client = link.clients[client_id] = Session(None)
+            await self.handle_nonce_found(client, message)
+        elif kind == "closed":
+            link.clients.pop(int(payload), None)
+
+    async def divide_range_among_clients(self):
+        """Split the nonce range across front-ends in proportion to their miners."""
+        links = [link for link in self.sessions if link.client_count]
+        total_clients = sum(link.client_count for link in links)
+        if total_clients == 0:
+            return
+
+        total_range = self.end - self.start
+        current_start = self.start
+        for i, link in enumerate(links):
+            current_end = (
+                current_start + total_range * link.client_count // total_clients
+            )
+            if i == len(links) - 1:
+                current_end = self.end
+            await link.send_frame(
+                "range", json.dumps({"start": current_start, "end": current_end})
+            )
+            current_start = current_end
+
+
+class ShardFrontend(ConnectionManager):
+    """
+    Front-end worker of a sharded pool: serves its own miners, takes jobs and
+    its share of the nonce range from the coordinator, and forwards solutions.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.coordinator = CoordinatorLink()
+
+    async def register(self, websocket):
+        session = await super().register(websocket)
+        await self.coordinator.send_frame("clients", str(len(self.sessions)))
+        return session
+
+    async def unregister(self, websocket):
+        session = self.sessions.get(websocket)
+        await super().unregister(websocket)
+        try:
+            if session is not None:
+                await self.coordinator.send_frame("closed", str(session.session_id))
+            await self.coordinator.send_frame("clients", str(len(self.sessions)))
+        except ConnectionError:
+            # The coordinator is gone and this worker is shutting down
+            pass
+
+    async def check_api(self):
+        """Apply jobs and ranges published by the coordinator."""
+        async for kind, payload in self.coordinator.frames():
+            if kind == "range":
+                assigned = json.loads(payload)
+                self.start = assigned["start"]
+                self.end = assigned["end"]
+                await self.divide_range_among_clients()
+            elif kind == "broadcast":
+                message = json.loads(payload)
+                self.mining_info = message["message"]
+                if self.sessions:
+                    await self.broadcast(
+                        payload,
+                        encode_binary(message["event"], message["message"]),
+                        message["event"],
+                    )
+
+    async def handle_nonce_found(self, session, message):
+        """Forward a solution to the coordinator for validation."""
+        NONCES_RECEIVED.inc()
+        if not is_valid_nonce_message(message):
+            logger.warning("Received invalid nonce message")
+            await self.send_message(session, "error", "Invalid nonce message")
+            return
+        await self.coordinator.send_frame(
+            "solution",
+            json.dumps({"client": session.session_id, "message": message}),
+        )
+
+
+async def start_services(manager):
+    """Start the tasks shared by the single-process pool and the coordinator."""
+    asyncio.create_task(manager.check_api())
+    asyncio.create_task(manager.submitter.keep_warm())
+    asyncio.create_task(manager.snapshots.run(manager))
+    asyncio.create_task(manager.liveness.run())
+    if STRATUM_PORT:
+        manager.stratum = StratumServer(manager)
+        await manager.stratum.start(port=STRATUM_PORT)
+    notifier.start()
+    LoopWatchdog(on_lag=LOOP_LAG.observe).start()
+
+    # Sampling profiler, triggered by SIGUSR1 or the opt-in /debug/profile endpoint
+    profiler = SamplingProfiler()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, profiler.trigger)
+
+    async def profile_endpoint(query):
+        try:
+            seconds = float(parse_qs(query).get("seconds", [PROFILE_SECONDS])[0])
+        except ValueError:
+            seconds = math.nan
+        if not 0 < seconds <= PROFILE_MAX_SECONDS:
+            return 400, "text/plain", f"seconds must be in (0, {PROFILE_MAX_SECONDS}]\n"
+        if profiler.running:
+            return 409, "text/plain", "Profiler already running\n"
+        profiler.running = True
+        try:
+            _, collapsed = await asyncio.to_thread(profiler.profile, seconds, False)
+        finally:
+            profiler.running = False
+        return 200, "text/plain", collapsed
+
+    if PROFILE_ENDPOINT:
+        ROUTES["/debug/profile"] = profile_endpoint
+    if METRICS_PORT:
+        await start_metrics_server()
 
 
 async def main():
     """Start the WebSocket server and blockchain monitor task."""
 
-    PORT = 8765  # WebSocket server port
-
     manager = ConnectionManager()
-    server = await websockets.serve(manager.handle_client, "0.0.0.0", PORT)
+    CONNECTED_CLIENTS.callback = lambda: len(manager.sessions)
+    await manager.restore_snapshot()
+    server = await websockets.serve(
+        manager.handle_client,
+        "0.0.0.0",
+        PORT,
+        subprotocols=[BINARY_SUBPROTOCOL],
+        **{**server_options(), **manager.liveness.server_options()},
+    )
     logger.info(f"WebSocket server started on port {PORT}")
 
-    asyncio.create_task(manager.check_api())
+    await start_services(manager)
+
+    await server.wait_closed()
+
+
+async def coordinator_main(workers):
+    """Run the coordinator of a sharded pool and supervise its front-ends."""
+    manager = ShardCoordinator()
+    CONNECTED_CLIENTS.callback = lambda: sum(
+        link.client_count for link in manager.sessions
+    )
+    await manager.restore_snapshot()
+    server = await start_coordinator_server(manager.handle_frontend)
+    asyncio.create_task(supervise_frontends(workers, run_frontend))
+
+    await start_services(manager)
 
     await server.wait_closed()
 
 
+async def frontend_main(index):
+    """
+    Run one front-end worker, sharing the WebSocket port with its siblings.
+    Its own metrics are served on METRICS_PORT + 1 + index.
+    """
+    manager = ShardFrontend()
+    CONNECTED_CLIENTS.callback = lambda: len(manager.sessions)
+    await manager.coordinator.connect()
+    server = await websockets.serve(
+        manager.handle_client,
+        "0.0.0.0",
+        PORT,
+        reuse_port=True,
+        subprotocols=[BINARY_SUBPROTOCOL],
+        **{**server_options(), **manager.liveness.server_options()},
+    )
+    logger.info(f"Front-end worker {os.getpid()} serving port {PORT}")
+
+    LoopWatchdog(on_lag=LOOP_LAG.observe).start()
+    asyncio.create_task(manager.liveness.run())
+    if METRICS_PORT:
+        await start_metrics_server(port=METRICS_PORT + 1 + index)
+
+    # Runs until the coordinator goes away
+    await manager.check_api()
+    logger.error("Lost connection to coordinator, exiting")
+    server.close()
+    await server.wait_closed()
+
+
+def run_frontend(index):
+    install_event_loop()
+    asyncio.run(frontend_main(index))
+
+
 if __name__ == "__main__":
     setup_environment()
-    asyncio.run(main())
+    install_event_loop()
+    if POOL_WORKERS > 1:
+        frontends = start_frontends(POOL_WORKERS, run_frontend)
+        asyncio.run(coordinator_main(frontends))
+    else:
+        asyncio.run(main())
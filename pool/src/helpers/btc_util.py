@@ -3,49 +3,93 @@ from test_framework.address import address_to_scriptpubkey
 from test_framework.blocktools import (
     add_witness_commitment,
     create_block,
+    get_witness_script,
     script_BIP34_coinbase_height,
 )
-from test_framework.messages import COutPoint, CTransaction, CTxIn, CTxOut
+from test_framework.messages import (
+    COutPoint,
+    CTransaction,
+    CTxIn,
+    CTxInWitness,
+    CTxOut,
+    hash256,
+    ser_compact_size,
+    ser_uint256,
+    uint256_from_str,
+)
+from test_framework.script import CScript
 from src.lib.rpc import rpc_getblocktemplate, rpc_submitblock
+from src.helpers.merkle import MerkleTree
 from src.helpers.logger import logger
 
 # Load environment variables
 
 PUBLIC_KEY = os.getenv("MINER_PUBLIC_KEY")
 
+# Bytes reserved at the end of the coinbase scriptSig: extranonce1, assigned by
+# the pool per session, then extranonce2, chosen by the miner. WebSocket miners
+# split the nonce range instead and leave all of it zero.
+EXTRANONCE1_SIZE = 4
+EXTRANONCE2_SIZE = 4
+EXTRANONCE_SIZE = EXTRANONCE1_SIZE + EXTRANONCE2_SIZE
+
+# Target of a difficulty 1 share
+DIFF1_TARGET = 0x00000000FFFF0000000000000000000000000000000000000000000000000000
+
+# Template transactions included in a block
+MAX_TEMPLATE_TXS = 800
+
 
 def create_coinbase(height, value, address):
     """Creates a coinbase transaction for the given block height and mining reward."""
     spk = address_to_scriptpubkey(address)
     cb = CTransaction()
-    cb.vin = [
-        CTxIn(
-            COutPoint(0, 0xFFFFFFFF), script_BIP34_coinbase_height(height), 0xFFFFFFFF
-        )
-    ]
+    script_sig = CScript(
+        bytes(script_BIP34_coinbase_height(height))
+        + bytes([EXTRANONCE_SIZE])
+        + bytes(EXTRANONCE_SIZE)
+    )
+    cb.vin = [CTxIn(COutPoint(0, 0xFFFFFFFF), script_sig, 0xFFFFFFFF)]
     cb.vout = [CTxOut(value, spk)]
     cb.vin[0].nSequence = 2**32 - 2
     cb.rehash()
     return cb
 
 
-def create_mining_block(tmpl):
-    """Creates a new mining block using the given template."""
+def create_mining_block(tmpl, txs=None, trees=None):
+    """
+    Creates a new mining block using the given template.
+    :param txs: Parsed template transactions (CachedTx entries from the pool's
+        TxCache). Their known hashes give both merkle roots without hashing
+        any transaction again; without them the template hex is parsed.
+    :param trees: Txid and witness MerkleTrees of the previous template,
+        updated in place so only the paths above changed leaves are rehashed.
+    """
     coinbase_transaction = create_coinbase(
         tmpl["height"], tmpl["coinbasevalue"], PUBLIC_KEY
     )
 
-    txhases = []
-    txn_count = 0
-
-    for txn in tmpl["transactions"]:
-        txhases.append(txn["data"])
-        txn_count += 1
-        if txn_count >= 800:
-            break
+    if txs is None:
+        txhases = [txn["data"] for txn in tmpl["transactions"][:MAX_TEMPLATE_TXS]]
+        block = create_block(coinbase=coinbase_transaction, tmpl=tmpl, txlist=txhases)
+        add_witness_commitment(block=block)
+        return block
 
-    block = create_block(coinbase=coinbase_transaction, tmpl=tmpl, txlist=txhases)
-    add_witness_commitment(block=block)
+    txid_tree, witness_tree = trees or (MerkleTree(), MerkleTree())
+    block = create_block(coinbase=coinbase_transaction, tmpl=tmpl)
+    block.vtx.extend(tx.tx for tx in txs)
+    # Same as add_witness_commitment, from the cached witness hashes
+    witness_tree.update([ser_uint256(0)] + [tx.wtxid for tx in txs])
+    witness_root = uint256_from_str(witness_tree.root)
+    coinbase_transaction.wit.vtxinwit = [CTxInWitness()]
+    coinbase_transaction.wit.vtxinwit[0].scriptWitness.stack = [ser_uint256(0)]
+    coinbase_transaction.vout.append(CTxOut(0, get_witness_script(witness_root, 0)))
+    coinbase_transaction.rehash()
+    txid_tree.update(
+        [ser_uint256(coinbase_transaction.sha256)] + [tx.txid for tx in txs]
+    )
+    block.hashMerkleRoot = uint256_from_str(txid_tree.root)
+    block.rehash()
     return block
 
 
@@ -58,3 +102,63 @@ def get_mining_template(block):
         "timestamp": block.nTime,
         "bits_difficulty": block.nBits,
     }
+
+
+def get_header_prefix(block):
+    """Serializes the header fields that stay fixed for a template: version, previous block and merkle root."""
+    return (
+        block.nVersion.to_bytes(4, "little", signed=True)
+        + ser_uint256(block.hashPrevBlock)
+        + ser_uint256(block.hashMerkleRoot)
+    )
+
+
+def build_header(header_prefix, timestamp, bits, nonce):
+    """Completes the 80-byte block header from the cached prefix and a solution."""
+    return (
+        header_prefix
+        + timestamp.to_bytes(4, "little")
+        + bits.to_bytes(4, "little")
+        + nonce.to_bytes(4, "little")
+    )
+
+
+def check_header_pow(header, target):
+    """
+    Checks only the 80-byte header hash of a solution against the target.
+    :return: Tuple of (meets_target, header_hash).
+    """
+    header_hash = uint256_from_str(hash256(header))
+    return header_hash <= target, header_hash
+
+
+def split_coinbase(coinbase, with_witness=False):
+    """
+    Splits a serialized coinbase around its extranonce placeholder.
+    :return: Tuple of (coinb1, coinb2); coinb1 + extranonce + coinb2 is the transaction.
+    """
+    if with_witness:
+        data = coinbase.serialize_with_witness()
+        marker = 0 if coinbase.wit.is_null() else 2
+    else:
+        data = coinbase.serialize_without_witness()
+        marker = 0
+    script_sig = coinbase.vin[0].scriptSig
+    end = 4 + marker + 1 + 36 + len(ser_compact_size(len(script_sig))) + len(script_sig)
+    return data[: end - EXTRANONCE_SIZE], data[end:]
+
+
+def merkle_root_from_branch(leaf, branch, index=0):
+    """Folds a leaf's hash up its merkle branch into the root."""
+    for sibling in branch:
+        leaf = hash256(sibling + leaf) if index & 1 else hash256(leaf + sibling)
+        index >>= 1
+    return leaf
+
+
+def verify_block_consistency(block):
+    """Runs the full transaction and merkle root consistency check of a block (without proof of work)."""
+    for tx in block.vtx:
+        if not tx.is_valid():
+            return False
+    return block.calc_merkle_root() == block.hashMerkleRoot
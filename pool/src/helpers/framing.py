@@ -0,0 +1,113 @@
+import json
+import struct
+
+
+# Offered by miners in the WebSocket handshake; connections that do not
+# negotiate it keep exchanging JSON text frames
+BINARY_SUBPROTOCOL = "btc-pool.binary.v1"
+
+# Binary frames start with a one-byte message type followed by a fixed layout.
+# Hashes travel as raw 32-byte little-endian values, ranges as u64 because the
+# end of the nonce range is 2^32.
+JOB = 1
+RANGE = 2
+SOLUTION = 3
+PING = 4
+PONG = 5
+HELLO = 6
+
+JOB_FORMAT = struct.Struct("<BIi32s32sII")
+RANGE_FORMAT = struct.Struct("<BQQ")
+SOLUTION_FORMAT = struct.Struct("<BIII")
+PING_FORMAT = struct.Struct("<BI")
+HELLO_FORMAT = struct.Struct("<BB")
+
+
+def is_binary(websocket):
+    return getattr(websocket, "subprotocol", None) == BINARY_SUBPROTOCOL
+
+
+def encode_json(event, message):
+    return json.dumps({"event": event, "message": message})
+
+
+def encode_binary(event, message):
+    """Encode a message as a binary frame, or return None if it has no binary layout."""
+    if event == "height_changed":
+        return JOB_FORMAT.pack(
+            JOB,
+            message.get("job_id") or 0,
+            message["version"],
+            message["prev_block"].to_bytes(32, "little"),
+            message["mrkl_root"].to_bytes(32, "little"),
+            message["timestamp"],
+            message["bits_difficulty"],
+        )
+    if event == "range_assignment":
+        return RANGE_FORMAT.pack(RANGE, message["start"], message["end"])
+    if event == "nonce_found" and set(message) <= {"job_id", "nonce", "timestamp"}:
+        return SOLUTION_FORMAT.pack(
+            SOLUTION, message.get("job_id") or 0, message["nonce"], message["timestamp"]
+        )
+    if event == "ping":
+        # Requests carry a sequence number, replies are "Ping back: <seq>"
+        if isinstance(message, int):
+            return PING_FORMAT.pack(PING, message & 0xFFFFFFFF)
+        seq = str(message).rsplit(" ", 1)[-1]
+        if seq.isdigit():
+            return PING_FORMAT.pack(PONG, int(seq) & 0xFFFFFFFF)
+        return None
+    if event == "hello":
+        miner_id = message["miner_id"].encode()
+        if len(miner_id) <= 255:
+            return HELLO_FORMAT.pack(HELLO, len(miner_id)) + miner_id
+    return None
+
+
+def encode_for(websocket, event, message):
+    """Encode a message in the format negotiated on the connection."""
+    if is_binary(websocket):
+        data = encode_binary(event, message)
+        if data is not None:
+            return data
+    return encode_json(event, message)
+
+
+def decode_message(data):
+    """Decode a text (JSON) or binary frame into an (event, message) tuple."""
+    if isinstance(data, str):
+        message_data = json.loads(data)
+        return message_data.get("event"), message_data.get("message")
+
+    kind = data[0]
+    if kind == JOB:
+        _, job_id, version, prev_block, mrkl_root, timestamp, bits = JOB_FORMAT.unpack(
+            data
+        )
+        return "height_changed", {
+            "version": version,
+            "prev_block": int.from_bytes(prev_block, "little"),
+            "mrkl_root": int.from_bytes(mrkl_root, "little"),
+            "timestamp": timestamp,
+            "bits_difficulty": bits,
+            "job_id": job_id or None,
+        }
+    if kind == RANGE:
+        _, start, end = RANGE_FORMAT.unpack(data)
+        return "range_assignment", {"start": start, "end": end}
+    if kind == SOLUTION:
+        _, job_id, nonce, timestamp = SOLUTION_FORMAT.unpack(data)
+        return "nonce_found", {
+            "job_id": job_id or None,
+            "nonce": nonce,
+            "timestamp": timestamp,
+        }
+    if kind == PING:
+        return "ping", PING_FORMAT.unpack(data)[1]
+    if kind == PONG:
+        return "ping", f"Ping back: {PING_FORMAT.unpack(data)[1]}"
+    if kind == HELLO:
+        _, length = HELLO_FORMAT.unpack_from(data)
+        miner_id = bytes(data[HELLO_FORMAT.size : HELLO_FORMAT.size + length])
+        return "hello", {"miner_id": miner_id.decode()}
+    raise ValueError(f"Unknown binary message type {kind}")
@@ -0,0 +1,87 @@
+from test_framework.messages import hash256
+
+
+class MerkleTree:
+    """
+    Bitcoin merkle tree that keeps every interior node.
+
+    Hashes are 32-byte little-endian values, and an odd node at any level is
+    paired with itself, as in `CBlock.get_merkle_root`. Changing leaves only
+    rehashes the nodes above them: replacing the coinbase or another single
+    leaf costs one hash per level, and appending costs the new right edge.
+    """
+
+    def __init__(self, leaves=()):
+        # levels[0] holds the leaves, levels[-1] the root
+        self.levels = [[]]
+        if leaves:
+            self.update(leaves)
+
+    def __len__(self):
+        return len(self.levels[0])
+
+    @property
+    def root(self):
+        if not self.levels[0]:
+            raise ValueError("Merkle tree has no leaves")
+        return self.levels[-1][0]
+
+    def set_leaf(self, index, leaf):
+        """Replace one leaf and rehash its path to the root."""
+        self.levels[0][index] = leaf
+        self._rehash([index])
+
+    def append(self, leaf):
+        self.levels[0].append(leaf)
+        self._rehash([len(self.levels[0]) - 1])
+
+    def update(self, leaves):
+        """Make the tree hold `leaves`, rehashing only nodes above leaves that changed."""
+        old = self.levels[0]
+        count = len(leaves)
+        if not count:
+            self.levels = [[]]
+            return
+        dirty = [i for i in range(count) if i >= len(old) or old[i] != leaves[i]]
+        if count < len(old) and dirty[-1:] != [count - 1]:
+            # The new last leaf may now be paired with itself
+            dirty.append(count - 1)
+        self.levels[0] = list(leaves)
+        if dirty or count != len(old):
+            self._rehash(dirty)
+
+    def _rehash(self, dirty):
+        """Recompute the parents of the given leaf indices, level by level."""
+        levels = self.levels
+        depth = 0
+        while len(levels[depth]) > 1:
+            below = levels[depth]
+            count = len(below)
+            if depth + 1 == len(levels):
+                levels.append([])
+            above = levels[depth + 1]
+            del above[(count + 1) // 2 :]
+            parents = sorted({i // 2 for i in dirty})
+            for i in parents:
+                left = below[2 * i]
+                right = below[2 * i + 1] if 2 * i + 1 < count else left
+                node = hash256(left + right)
+                if i < len(above):
+                    above[i] = node
+                else:
+                    above.append(node)
+            dirty = parents
+            depth += 1
+        del levels[depth + 1 :]
+
+    def branch(self, index=0):
+        """
+        Return the merkle branch of a leaf: its sibling at each level, bottom
+        up. `merkle_root_from_branch(leaf, branch, index)` gives the root.
+        """
+        branch = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            branch.append(level[sibling] if sibling < len(level) else level[index])
+            index //= 2
+        return branch
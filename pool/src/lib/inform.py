@@ -1,5 +1,11 @@
-import requests
+import asyncio
+import json
 import os
+import threading
+import time
+
+import requests
+
 from src.helpers.logger import logger
 
 # Load environment variables from .env file
@@ -9,24 +15,212 @@ from src.helpers.logger import logger
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHANNEL_ID = os.getenv("TELEGRAM_CHANNEL_ID")
 
+# Optional local stand-in sinks
+NOTIFY_FILE = os.getenv("NOTIFY_FILE")
+NOTIFY_URL = os.getenv("NOTIFY_URL")
+
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "1000"))
+NOTIFY_TIMEOUT = float(os.getenv("NOTIFY_TIMEOUT", "5"))
+NOTIFY_RETRIES = int(os.getenv("NOTIFY_RETRIES", "3"))
+NOTIFY_RATE_PER_MINUTE = float(os.getenv("NOTIFY_RATE_PER_MINUTE", "20"))
+NOTIFY_COALESCE_WINDOW = float(os.getenv("NOTIFY_COALESCE_WINDOW", "30"))
+
+
+class TelegramSink:
+    """Deliver notifications to a Telegram channel."""
+
+    name = "telegram"
+
+    def __init__(self, token, channel_id, timeout=NOTIFY_TIMEOUT):
+        self.url = f"https://api.telegram.org/bot{token}/sendMessage"
+        self.channel_id = channel_id
+        self.timeout = timeout
+
+    def send(self, message_text):
+        payload = {"chat_id": f"{self.channel_id}", "text": message_text}
+        headers = {"Content-Type": "application/json"}
+        response = requests.post(
+            self.url, json=payload, headers=headers, timeout=self.timeout
+        )
+        response.raise_for_status()  # Raise an error for failed requests
+
+
+class HttpSink:
+    """POST notifications as JSON to an arbitrary HTTP endpoint."""
+
+    name = "http"
+
+    def __init__(self, url, timeout=NOTIFY_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, message_text):
+        response = requests.post(
+            self.url, json={"text": message_text}, timeout=self.timeout
+        )
+        response.raise_for_status()
+
+
+class FileSink:
+    """Append notifications as JSON lines to a local file."""
+
+    name = "file"
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, message_text):
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"time": time.time(), "text": message_text}) + "\n")
+
 
-def inform_me(message_text):
+class Notifier:
     """
-    Send a message to the configured Telegram channel.
-    :param message_text: The message to send.
+    Asynchronous notification service.
+
+    `notify` never blocks: messages go into a bounded in-memory queue that a
+    background task drains, subject to a token-bucket rate limit. Each sink is
+    called in a worker thread with a timeout and retried with backoff. Messages
+    sharing a coalescing key within a window are folded into one digest.
     """
-    if TELEGRAM_BOT_TOKEN and TELEGRAM_CHANNEL_ID:
+
+    def __init__(
+        self,
+        sinks,
+        max_queue=NOTIFY_QUEUE_SIZE,
+        rate_per_minute=NOTIFY_RATE_PER_MINUTE,
+        coalesce_window=NOTIFY_COALESCE_WINDOW,
+        timeout=NOTIFY_TIMEOUT,
+        retries=NOTIFY_RETRIES,
+    ):
+        self.sinks = list(sinks)
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(rate_per_minute / 6.0, 1.0)
+        self.tokens = self.burst
+        self.last_refill = time.monotonic()
+        self.coalesce_window = coalesce_window
+        self.timeout = timeout
+        self.retries = max(retries, 1)
+        self.digests = {}
+        self.loop = None
+        self.loop_thread = None
+        self.task = None
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the background sender on the running event loop."""
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    def notify(self, message_text, key=None):
+        """
+        Queue a notification. Safe to call from any thread.
+        :param key: Optional coalescing key; bursts with the same key become a digest.
+        """
+        if self.loop is None or threading.get_ident() == self.loop_thread:
+            self._enqueue(message_text, key)
+        else:
+            self.loop.call_soon_threadsafe(self._enqueue, message_text, key)
+
+    def _enqueue(self, message_text, key):
+        if key is not None:
+            digest = self.digests.get(key)
+            if digest is not None:
+                digest[1] += 1
+                digest[2] = message_text
+                return
+            self.digests[key] = [time.monotonic(), 0, message_text]
         try:
-            url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-            payload = {"chat_id": f"{TELEGRAM_CHANNEL_ID}", "text": message_text}
-            headers = {"Content-Type": "application/json"}
-
-            logger.info("Sending message to Telegram...")
-            response = requests.post(url, json=payload, headers=headers)
-            response.raise_for_status()  # Raise an error for failed requests
-
-            logger.info("Message sent successfully")
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error sending message: {e}")
-    else:
-        logger.error("Telegram credentials not found in environment variables")
+            self.queue.put_nowait(message_text)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def run(self):
+        """Drain the queue forever, flushing expired digests along the way."""
+        while True:
+            try:
+                message_text = await asyncio.wait_for(
+                    self.queue.get(), timeout=self.coalesce_window
+                )
+            except asyncio.TimeoutError:
+                message_text = None
+            if message_text is not None:
+                await self.deliver(message_text)
+            self.flush_digests()
+
+    def flush_digests(self, force=False):
+        """Queue a digest for each coalescing key whose window has elapsed."""
+        now = time.monotonic()
+        for key, (opened, repeats, last_text) in list(self.digests.items()):
+            if not force and now - opened < self.coalesce_window:
+                continue
+            del self.digests[key]
+            if repeats:
+                self._enqueue(
+                    f"{repeats} more '{key}' notifications in the last "
+                    f"{now - opened:.0f}s, latest:\n{last_text}",
+                    None,
+                )
+
+    async def acquire(self):
+        """Wait for a rate limiter token."""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.last_refill) * self.rate
+            )
+            self.last_refill = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    async def deliver(self, message_text):
+        """Send one message to every sink, retrying each with exponential backoff."""
+        await self.acquire()
+        for sink in self.sinks:
+            for attempt in range(self.retries):
+                try:
+                    await asyncio.wait_for(
+                        asyncio.to_thread(sink.send, message_text), self.timeout
+                    )
+                    self.sent += 1
+                    break
+                except Exception as e:
+                    if attempt == self.retries - 1:
+                        self.failed += 1
+                        logger.error(f"Error sending message to {sink.name}: {e}")
+                    else:
+                        await asyncio.sleep(0.5 * 2**attempt)
+
+
+def sinks_from_env():
+    """Build the notification sinks configured in the environment."""
+    sinks = []
+    if TELEGRAM_BOT_TOKEN and TELEGRAM_CHANNEL_ID:
+        sinks.append(TelegramSink(TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_ID))
+    if NOTIFY_URL:
+        sinks.append(HttpSink(NOTIFY_URL))
+    if NOTIFY_FILE:
+        sinks.append(FileSink(NOTIFY_FILE))
+    if not sinks:
+        logger.warning("No notification sinks configured, notifications disabled")
+    return sinks
+
+
+notifier = Notifier(sinks_from_env())
+
+
+def inform_me(message_text, key=None):
+    """
+    Queue a message for the configured notification sinks without blocking.
+    :param message_text: The message to send.
+    :param key: Optional coalescing key for repeated messages (e.g. RPC errors).
+    """
+    if notifier.sinks:
+        notifier.notify(message_text, key)
@@ -0,0 +1,167 @@
+import os
+from collections import OrderedDict
+
+from src.helpers.btc_util import (
+    EXTRANONCE_SIZE,
+    get_header_prefix,
+    get_mining_template,
+    merkle_root_from_branch,
+    split_coinbase,
+)
+from src.helpers.merkle import MerkleTree
+from test_framework.messages import (
+    hash256,
+    ser_compact_size,
+    ser_uint256,
+    uint256_from_compact,
+)
+
+
+JOB_RING_SIZE = int(os.getenv("JOB_RING_SIZE", "16"))
+# Per-job cap on remembered solutions, bounding dedupe memory to ring size x cap;
+# past it the oldest are forgotten
+MAX_SOLUTIONS_PER_JOB = int(os.getenv("MAX_SOLUTIONS_PER_JOB", "65536"))
+
+
+class Job:
+    """A mining job: one block template plus the data cached for validating solutions."""
+
+    __slots__ = (
+        "job_id",
+        "height",
+        "block",
+        "header_prefix",
+        "block_tail",
+        "coinb1",
+        "coinb2",
+        "witness_coinb1",
+        "witness_coinb2",
+        "merkle_branch",
+        "txs_tail",
+        "target",
+        "mining_info",
+        "solutions",
+    )
+
+    def __init__(self, job_id, height, block, txs=None, merkle_tree=None):
+        """
+        :param txs: Cached entries of the block's non-coinbase transactions;
+            their hashes and raw bytes are reused instead of recomputed.
+        :param merkle_tree: Txid tree the block was built with, read for the
+            coinbase branch without hashing.
+        """
+        self.job_id = job_id
+        self.height = height
+        self.block = block
+        self.header_prefix = get_header_prefix(block)
+        coinbase = block.vtx[0]
+        self.coinb1, self.coinb2 = split_coinbase(coinbase)
+        self.witness_coinb1, self.witness_coinb2 = split_coinbase(
+            coinbase, with_witness=True
+        )
+        coinbase.calc_sha256()
+        if txs is None:
+            for tx in block.vtx[1:]:
+                tx.calc_sha256()
+            tx_hashes = [ser_uint256(tx.sha256) for tx in block.vtx[1:]]
+            self.txs_tail = b"".join(
+                tx.serialize_with_witness() for tx in block.vtx[1:]
+            )
+        else:
+            tx_hashes = [tx.txid for tx in txs]
+            self.txs_tail = b"".join(tx.raw for tx in txs)
+        if merkle_tree is None:
+            merkle_tree = MerkleTree([ser_uint256(coinbase.sha256)] + tx_hashes)
+        self.merkle_branch = merkle_tree.branch(0)
+        self.block_tail = self.block_tail_for(bytes(EXTRANONCE_SIZE))
+        self.target = uint256_from_compact(block.nBits)
+        self.mining_info = get_mining_template(block)
+        self.mining_info["job_id"] = job_id
+        # Solution keys in submission order, used as a bounded ordered set
+        self.solutions = OrderedDict()
+
+    @staticmethod
+    def solution_key(extranonce, ntime, nonce):
+        """Pack the fields that vary between solutions of a job into a single int."""
+        return (extranonce << 64) | ((ntime & 0xFFFFFFFF) << 32) | (nonce & 0xFFFFFFFF)
+
+    def is_duplicate(self, key):
+        return key in self.solutions
+
+    def record_solution(self, key):
+        """Remember a solution that passed the proof-of-work check."""
+        solutions = self.solutions
+        if len(solutions) >= MAX_SOLUTIONS_PER_JOB:
+            solutions.popitem(last=False)
+        solutions[key] = None
+
+    def header_prefix_for(self, extranonce):
+        """Header prefix for a solution whose coinbase carries the given extranonce bytes."""
+        if extranonce == bytes(EXTRANONCE_SIZE):
+            return self.header_prefix
+        txid = hash256(self.coinb1 + extranonce + self.coinb2)
+        return self.header_prefix[:36] + merkle_root_from_branch(
+            txid, self.merkle_branch
+        )
+
+    def block_tail_for(self, extranonce):
+        """Hex of the transaction vector with the given extranonce in the coinbase."""
+        return (
+            ser_compact_size(len(self.block.vtx))
+            + self.witness_coinb1
+            + extranonce
+            + self.witness_coinb2
+            + self.txs_tail
+        ).hex()
+
+    @property
+    def prev_block(self):
+        return self.block.hashPrevBlock
+
+
+class JobRing:
+    """
+    Bounded ring of recent jobs indexed by their monotonically increasing id.
+    Lookups are a single slot access, so stale solutions are rejected without hashing.
+    """
+
+    def __init__(self, size=JOB_RING_SIZE):
+        self.size = size
+        self.slots = [None] * size
+        self.next_id = 1
+        self.current = None
+
+    def create(self, height, block, txs=None, merkle_tree=None):
+        """Create a job for a new template and make it the current one."""
+        job = Job(self.next_id, height, block, txs, merkle_tree)
+        self.next_id += 1
+        self.slots[job.job_id % self.size] = job
+        self.current = job
+        return job
+
+    def restore(self, jobs, current_id, next_id):
+        """
+        Reinstate jobs saved before a restart, keeping their ids.
+        :param jobs: Iterable of (job_id, height, block) tuples.
+        """
+        for job_id, height, block in jobs:
+            job = Job(job_id, height, block)
+            self.slots[job_id % self.size] = job
+            if job_id == current_id:
+                self.current = job
+        self.next_id = max(self.next_id, next_id)
+
+    def get(self, job_id):
+        """Return the job with the given id, or None if it was evicted or never existed."""
+        if job_id is None:
+            return self.current
+        if not isinstance(job_id, int):
+            return None
+        job = self.slots[job_id % self.size]
+        if job is None or job.job_id != job_id:
+            return None
+        return job
+
+    def is_stale(self, job):
+        """A job is stale once the chain tip moved past the block it builds on."""
+        return self.current is None or job.prev_block != self.current.prev_block
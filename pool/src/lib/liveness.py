@@ -0,0 +1,157 @@
+import asyncio
+import math
+import os
+import time
+
+from websockets.exceptions import ConnectionClosed
+from websockets.legacy.server import WebSocketServerProtocol
+
+from src.helpers.logger import logger
+from src.lib.metrics import CLIENTS_IDLE_EVICTED, LIVENESS_PROBES
+
+
+# Seconds without any frame from a miner before it is probed
+IDLE_TIMEOUT = float(os.getenv("IDLE_TIMEOUT", "60"))
+# Seconds a probed miner has to answer before it is disconnected
+PROBE_TIMEOUT = float(os.getenv("PROBE_TIMEOUT", "10"))
+# Resolution of the idle timer wheel in seconds
+WHEEL_TICK = float(os.getenv("WHEEL_TICK", "1"))
+
+# WebSocket close code for idle clients (going away)
+IDLE_CLOSE_CODE = 1001
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: one bucket per tick, covering `span` seconds.
+
+    Scheduling and cancelling are set operations, and each tick only touches
+    the bucket that falls due, so the cost does not depend on how many timers
+    are pending.
+    """
+
+    def __init__(self, tick, span):
+        self.tick = tick
+        self.buckets = [set() for _ in range(math.ceil(span / tick) + 2)]
+        self.bucket_of = {}
+        self.current_tick = math.floor(time.monotonic() / tick)
+
+    def __len__(self):
+        return len(self.bucket_of)
+
+    def schedule(self, item, deadline):
+        """(Re)schedule an item to fall due at a monotonic deadline."""
+        self.cancel(item)
+        ticks = math.ceil(deadline / self.tick) - self.current_tick
+        ticks = min(max(ticks, 1), len(self.buckets) - 1)
+        index = (self.current_tick + ticks) % len(self.buckets)
+        self.buckets[index].add(item)
+        self.bucket_of[item] = index
+
+    def cancel(self, item):
+        index = self.bucket_of.pop(item, None)
+        if index is not None:
+            self.buckets[index].discard(item)
+
+    def advance(self, now):
+        """Move the wheel up to `now` and return the items that fell due."""
+        due = []
+        target = math.floor(now / self.tick)
+        while self.current_tick < target:
+            self.current_tick += 1
+            index = self.current_tick % len(self.buckets)
+            bucket = self.buckets[index]
+            if bucket:
+                self.buckets[index] = set()
+                for item in bucket:
+                    del self.bucket_of[item]
+                due.extend(bucket)
+        return due
+
+
+class LivenessMonitor:
+    """
+    Tracks the last activity of every miner and disconnects idle ones.
+
+    Any data frame, and any WebSocket ping the miner sends, counts as
+    activity; recording it is a single attribute store on the session. Each
+    session sits in the timer wheel once. When its slot comes up it is either
+    rescheduled from its last activity, probed with a WebSocket ping (a
+    control frame answered by the miner's library, no JSON), or, if the probe
+    went unanswered, disconnected. This replaces the library's per-connection
+    keepalive task.
+    """
+
+    def __init__(
+        self,
+        sessions,
+        idle_timeout=IDLE_TIMEOUT,
+        probe_timeout=PROBE_TIMEOUT,
+        tick=WHEEL_TICK,
+    ):
+        """
+        :param sessions: The manager's sessions, keyed by WebSocket.
+        """
+        self.sessions = sessions
+        self.idle_timeout = idle_timeout
+        self.probe_timeout = probe_timeout
+        self.tick = tick
+        self.wheel = TimerWheel(tick, max(idle_timeout, probe_timeout))
+
+    def add(self, session):
+        self.wheel.schedule(session, session.last_active + self.idle_timeout)
+
+    def touch(self, session):
+        session.last_active = time.monotonic()
+
+    def remove(self, session):
+        self.wheel.cancel(session)
+
+    def protocol_class(self):
+        """Server protocol class that reports miners' WebSocket pings as activity."""
+        sessions = self.sessions
+
+        class ActivityProtocol(WebSocketServerProtocol):
+            async def pong(self, data=b""):
+                session = sessions.get(self)
+                if session is not None:
+                    session.last_active = time.monotonic()
+                await super().pong(data)
+
+        return ActivityProtocol
+
+    def server_options(self):
+        """Keyword arguments for `websockets.serve` so the wheel handles keepalive."""
+        return {"ping_interval": None, "create_protocol": self.protocol_class()}
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            now = time.monotonic()
+            for session in self.wheel.advance(now):
+                last_active = session.last_active
+                if now - last_active < self.idle_timeout:
+                    session.probed_at = None
+                    self.wheel.schedule(session, last_active + self.idle_timeout)
+                elif session.probed_at is not None and last_active < session.probed_at:
+                    # No activity since the last probe, which went unanswered
+                    self.evict(session)
+                else:
+                    session.probed_at = now
+                    self.wheel.schedule(session, now + self.probe_timeout)
+                    asyncio.create_task(self.probe(session))
+
+    async def probe(self, session):
+        LIVENESS_PROBES.inc()
+        try:
+            pong_waiter = await session.websocket.ping()
+            await asyncio.wait_for(pong_waiter, self.probe_timeout)
+        except (ConnectionClosed, asyncio.TimeoutError):
+            return
+        self.touch(session)
+
+    def evict(self, session):
+        self.remove(session)
+        CLIENTS_IDLE_EVICTED.inc()
+        logger.warning("Disconnecting idle client that did not answer a ping")
+        asyncio.create_task(session.websocket.close(IDLE_CLOSE_CODE, "idle timeout"))
@@ -0,0 +1,284 @@
+import asyncio
+import os
+import time
+from bisect import bisect_left
+
+from src.helpers.logger import logger
+
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+# Latency buckets in seconds, from sub-millisecond to tens of seconds
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+# Metric updates are plain attribute and list-slot increments without locks.
+# Hot paths run on the event loop thread; updates from executor threads may in
+# rare cases lose an increment, which is acceptable for monitoring.
+
+
+class Counter:
+    """
+    A monotonically increasing counter, or one read at scrape time from a
+    callback returning a running total kept elsewhere.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, callback=None):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self.callback = callback
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        yield self.name, "", self.callback() if self.callback else self.value
+
+
+class Gauge:
+    """A value that can go up and down, or be read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, callback=None):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self.callback = callback
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        yield self.name, "", self.callback() if self.callback else self.value
+
+
+class Histogram:
+    """A fixed-bucket histogram; observing is a bisect and two additions."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS, label=None):
+        self.name = name
+        self.help = help_text
+        self.bounds = tuple(buckets)
+        self.label = label
+        self.children = {}
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def labels(self, value):
+        """Return the child histogram for a label value, creating it on first use."""
+        child = self.children.get(value)
+        if child is None:
+            child = Histogram(self.name, self.help, self.bounds)
+            self.children[value] = child
+        return child
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self):
+        """Context manager observing the duration of its block."""
+        return _Timer(self)
+
+    def samples(self):
+        if self.label is None:
+            yield from self._samples("")
+        else:
+            for value, child in sorted(self.children.items()):
+                yield from child._samples(f'{self.label}="{value}"')
+
+    def _samples(self, labels):
+        sep = "," if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            yield f"{self.name}_bucket", f'{labels}{sep}le="{bound}"', cumulative
+        cumulative += self.counts[-1]
+        yield f"{self.name}_bucket", f'{labels}{sep}le="+Inf"', cumulative
+        yield f"{self.name}_sum", labels, self.sum
+        yield f"{self.name}_count", labels, cumulative
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    lines.append(f"{name}{{{labels}}} {value}")
+                else:
+                    lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CONNECTED_CLIENTS = REGISTRY.register(
+    Gauge("pool_connected_clients", "Number of connected miners.")
+)
+BROADCAST_LATENCY = REGISTRY.register(
+    Histogram("pool_broadcast_seconds", "Time to fan a job out to every miner.")
+)
+RPC_LATENCY = REGISTRY.register(
+    Histogram("pool_rpc_seconds", "Bitcoin Daemon RPC latency.", label="method")
+)
+TEMPLATE_BUILD_TIME = REGISTRY.register(
+    Histogram(
+        "pool_template_build_seconds", "Time to build a job from a block template."
+    )
+)
+TX_CACHE_HITS = REGISTRY.register(
+    Counter("pool_tx_cache_hits_total", "Template transactions reused from the cache.")
+)
+TX_CACHE_MISSES = REGISTRY.register(
+    Counter("pool_tx_cache_misses_total", "Template transactions parsed anew.")
+)
+NONCES_RECEIVED = REGISTRY.register(
+    Counter("pool_nonces_received_total", "Nonce messages received from miners.")
+)
+SOLUTIONS_VALID = REGISTRY.register(
+    Counter("pool_solutions_valid_total", "Solutions meeting the block target.")
+)
+SOLUTIONS_INVALID = REGISTRY.register(
+    Counter("pool_solutions_invalid_total", "Solutions not meeting the target.")
+)
+SOLUTIONS_STALE = REGISTRY.register(
+    Counter("pool_solutions_stale_total", "Solutions for stale or unknown jobs.")
+)
+SOLUTIONS_DUPLICATE = REGISTRY.register(
+    Counter("pool_solutions_duplicate_total", "Solutions submitted more than once.")
+)
+MESSAGES_SUPERSEDED = REGISTRY.register(
+    Counter(
+        "pool_messages_superseded_total",
+        "Queued jobs or ranges replaced by a newer one before being sent.",
+    )
+)
+MESSAGES_DROPPED = REGISTRY.register(
+    Counter("pool_messages_dropped_total", "Messages dropped from full send queues.")
+)
+CLIENTS_EVICTED = REGISTRY.register(
+    Counter("pool_clients_evicted_total", "Miners disconnected for not keeping up.")
+)
+LIVENESS_PROBES = REGISTRY.register(
+    Counter("pool_liveness_probes_total", "WebSocket pings sent to idle miners.")
+)
+CLIENTS_IDLE_EVICTED = REGISTRY.register(
+    Counter("pool_clients_idle_evicted_total", "Miners disconnected as idle.")
+)
+STRATUM_SESSIONS = REGISTRY.register(
+    Gauge("pool_stratum_sessions", "Number of connected Stratum clients.")
+)
+SHARES_ACCEPTED = REGISTRY.register(
+    Counter("pool_shares_accepted_total", "Stratum shares meeting the share target.")
+)
+SUBMISSION_LATENCY = REGISTRY.register(
+    Histogram(
+        "pool_submission_seconds", "Time from nonce receipt to submitblock result."
+    )
+)
+LOG_RECORDS_DROPPED = REGISTRY.register(
+    Counter(
+        "pool_log_records_dropped_total",
+        "Log records dropped because the log queue was full.",
+        callback=lambda: sum(getattr(h, "dropped", 0) for h in logger.handlers),
+    )
+)
+LOOP_LAG = REGISTRY.register(
+    Histogram("pool_event_loop_lag_seconds", "Event loop scheduling lag.")
+)
+
+
+async def metrics_endpoint(query):
+    return 200, "text/plain; version=0.0.4", REGISTRY.render()
+
+
+ROUTES = {"/metrics": metrics_endpoint}
+
+
+async def handle_http(reader, writer):
+    """Serve a single HTTP request from ROUTES, then close the connection."""
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (
+            b"\r\n",
+            b"\n",
+            b"",
+        ):
+            pass
+        parts = request_line.decode("latin-1").split()
+        path = parts[1] if len(parts) > 1 else "/"
+        route, _, query = path.partition("?")
+        handler = ROUTES.get(route)
+        if handler is None:
+            status, content_type, body = 404, "text/plain", "Not found\n"
+        else:
+            status, content_type, body = await handler(query)
+        payload = body.encode()
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n".encode() + payload
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    except Exception as e:
+        logger.error(f"Error serving metrics request: {e}")
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host="0.0.0.0", port=METRICS_PORT):
+    """Serve ROUTES over HTTP on the running event loop."""
+    server = await asyncio.start_server(handle_http, host, port)
+    logger.info(f"Metrics server started on port {port}")
+    return server
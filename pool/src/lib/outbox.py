@@ -0,0 +1,121 @@
+import asyncio
+import os
+import time
+
+from websockets.exceptions import ConnectionClosed
+
+from src.helpers.logger import logger
+from src.lib.metrics import CLIENTS_EVICTED, MESSAGES_DROPPED, MESSAGES_SUPERSEDED
+
+
+# Maximum number of messages queued for one client
+SEND_QUEUE_SIZE = int(os.getenv("SEND_QUEUE_SIZE", "64"))
+# Seconds a client may keep its queue full, or block a single send, before it is disconnected
+SLOW_CLIENT_TIMEOUT = float(os.getenv("SLOW_CLIENT_TIMEOUT", "10"))
+
+# Only the latest queued message of these events is worth delivering
+SUPERSEDED_EVENTS = ("height_changed", "range_assignment")
+
+# WebSocket close code for evicted clients (policy violation)
+EVICTION_CLOSE_CODE = 1008
+
+
+class Outbox:
+    """
+    Bounded outbound queue of one client, drained by its own writer task.
+
+    `put` never waits, so a broadcast costs the same however slow the clients
+    are. A queued job or range is replaced by a newer one instead of piling up,
+    a full queue drops its oldest other message, and a client whose queue
+    stays full (or whose send blocks) past the timeout is disconnected.
+    """
+
+    __slots__ = (
+        "websocket",
+        "max_size",
+        "timeout",
+        "queue",
+        "waiter",
+        "full_since",
+        "closed",
+        "task",
+    )
+
+    def __init__(
+        self, websocket, max_size=SEND_QUEUE_SIZE, timeout=SLOW_CLIENT_TIMEOUT
+    ):
+        self.websocket = websocket
+        self.max_size = max_size
+        self.timeout = timeout
+        # (event, data) pairs; a short list is smaller than a deque or an Event
+        self.queue = []
+        self.waiter = None
+        self.full_since = None
+        self.closed = False
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        self.closed = True
+        if self.task is not None:
+            self.task.cancel()
+
+    def put(self, data, event=None):
+        """Queue an encoded message without waiting."""
+        if self.closed:
+            return
+        queue = self.queue
+        if queue and event in SUPERSEDED_EVENTS:
+            self.remove_first(event, MESSAGES_SUPERSEDED)
+        if len(queue) >= self.max_size:
+            now = time.monotonic()
+            if self.full_since is None:
+                self.full_since = now
+            elif now - self.full_since >= self.timeout:
+                self.evict("send queue full")
+                return
+            self.remove_first(None, MESSAGES_DROPPED)
+        queue.append((event, data))
+        waiter = self.waiter
+        if waiter is not None:
+            self.waiter = None
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def remove_first(self, event, counter):
+        """Remove the oldest message of an event, or of any other event if None."""
+        for i, (queued, _) in enumerate(self.queue):
+            if (queued == event) if event else (queued not in SUPERSEDED_EVENTS):
+                del self.queue[i]
+                counter.inc()
+                return
+
+    async def run(self):
+        """Send queued messages in order until the connection closes."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                if not self.queue:
+                    self.waiter = loop.create_future()
+                    await self.waiter
+                    continue
+                _, data = self.queue.pop(0)
+                await asyncio.wait_for(self.websocket.send(data), self.timeout)
+                if len(self.queue) < self.max_size:
+                    self.full_since = None
+        except asyncio.TimeoutError:
+            self.evict("send timed out")
+        except ConnectionClosed:
+            self.closed = True
+
+    def evict(self, reason):
+        """Disconnect a client that does not keep up; its handler unregisters it."""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        CLIENTS_EVICTED.inc()
+        logger.warning(f"Disconnecting slow client: {reason}")
+        asyncio.create_task(self.websocket.close(EVICTION_CLOSE_CODE, "slow consumer"))
@@ -1,12 +1,16 @@
 import base64
+import http.client
 import json
 import random
+import socket
+import urllib.parse
 import urllib.request
 
 import os
 
 
 from src.lib.inform import inform_me
+from src.lib.metrics import RPC_LATENCY
 from src.helpers.logger import logger
 
 
@@ -34,8 +38,9 @@ def rpc(method, params=None):
 
         logger.info(f"Sending RPC request: {method}")
 
-        with urllib.request.urlopen(request) as response:
-            result = json.loads(response.read())
+        with RPC_LATENCY.labels(method).time():
+            with urllib.request.urlopen(request) as response:
+                result = json.loads(response.read())
 
         # Validate the response ID
         if result["id"] != rpc_id:
@@ -92,23 +97,71 @@ def rpc_submitblock(block_submission):
         return rpc("submitblock", [block_submission])
     except Exception as e:
         logger.error(f"Error submitting block: {e}")
-        inform_me(f"Error submitting block: {e}")
+        inform_me(f"Error submitting block: {e}", key="rpc_error")
         return None
 
 
-def publish_block(block, height):
+class RPCConnection:
     """
-    Publish a mined block to the blockchain.
-    :param block: The block object.
-    :param height: The height of the block in the blockchain.
-    :return: RPC response or None if submission fails.
+    A persistent (HTTP keep-alive) JSON-RPC connection to the Bitcoin Daemon.
+    Not thread-safe: each connection is meant to be owned by a single worker thread.
     """
-    try:
-        serialized_hex = block.serialize().hex()  # Convert block to hex format
-        result = rpc_submitblock(serialized_hex)
-        logger.info("Block submitted successfully")
-        inform_me(f"Block Mined\nBlock Height: {height}\nBlock Hash: {block.hash}")
-        return result
-    except Exception as e:
-        logger.error(f"Failed to publish block: {e}")
-        return None
+
+    def __init__(self, url=None, timeout=10):
+        parsed = urllib.parse.urlparse(url or RPC_URL)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.path = parsed.path or "/"
+        self.timeout = timeout
+        auth = base64.b64encode(f"{RPC_USER}:{RPC_PASS}".encode()).decode().strip()
+        self.headers = {
+            "Authorization": f"Basic {auth}",
+            "Content-Type": "application/json",
+        }
+        self.connection = None
+
+    def connect(self):
+        """Open the underlying HTTP connection if it is not open yet."""
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+            self.connection.connect()
+            self.connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def close(self):
+        """Close the underlying HTTP connection."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def call(self, method, params=None):
+        """
+        Make an RPC call over the persistent connection.
+        :raises ConnectionError: On transport failures (safe to retry).
+        :raises ValueError: When the daemon returns an RPC error.
+        """
+        rpc_id = random.getrandbits(32)
+        data = json.dumps({"id": rpc_id, "method": method, "params": params}).encode()
+        try:
+            with RPC_LATENCY.labels(method).time():
+                self.connect()
+                self.connection.request("POST", self.path, data, self.headers)
+                response = self.connection.getresponse()
+                body = response.read()
+        except (http.client.HTTPException, OSError) as e:
+            self.close()
+            raise ConnectionError(f"Failed to connect to {RPC_URL}: {e}")
+
+        try:
+            result = json.loads(body)
+        except json.JSONDecodeError:
+            raise ValueError(f"Invalid RPC response (HTTP {response.status})")
+
+        if result["id"] != rpc_id:
+            raise ValueError(
+                f"Invalid response ID: got {result['id']}, expected {rpc_id}"
+            )
+        if result["error"] is not None:
+            raise ValueError(f"RPC error: {json.dumps(result['error'])}")
+        return result["result"]
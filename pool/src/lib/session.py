@@ -0,0 +1,73 @@
+import itertools
+import time
+
+from src.helpers.framing import is_binary
+
+# Weight of the newest solution in a session's hashrate estimate
+HASHRATE_SMOOTHING = 0.2
+
+
+class Session:
+    """
+    Everything the pool tracks for one connected client.
+
+    Sessions are looked up by their WebSocket in the manager's `sessions`
+    dict; all per-miner state lives in slots here rather than in dicts keyed
+    by socket, so a disconnect frees it at once and broadcasts read it without
+    further lookups.
+    """
+
+    __slots__ = (
+        "session_id",
+        "websocket",
+        "binary",
+        "outbox",
+        "miner_id",
+        "assigned_range",
+        "extranonce",
+        "difficulty",
+        "hashrate",
+        "solutions",
+        "duplicates",
+        "last_solution",
+        "connected_at",
+        "last_active",
+        "probed_at",
+    )
+
+    next_id = itertools.count(1).__next__
+
+    def __init__(self, websocket, outbox=None, extranonce=0, difficulty=None):
+        """
+        :param extranonce: Coinbase extranonce prefix assigned to the client.
+        :param difficulty: Share difficulty; None when only blocks are accepted.
+        """
+        now = time.monotonic()
+        self.session_id = Session.next_id()
+        self.websocket = websocket
+        self.binary = is_binary(websocket)
+        self.outbox = outbox
+        self.miner_id = None
+        self.assigned_range = None
+        self.extranonce = extranonce
+        self.difficulty = difficulty
+        self.hashrate = 0.0
+        self.solutions = 0
+        self.duplicates = 0
+        self.last_solution = None
+        self.connected_at = now
+        self.last_active = now
+        self.probed_at = None
+
+    def credit(self, difficulty):
+        """
+        Count an accepted solution and fold it into the hashrate estimate.
+        :param difficulty: Difficulty the solution was found at, 2^32 hashes per unit.
+        """
+        now = time.monotonic()
+        elapsed = now - (self.last_solution or self.connected_at)
+        if elapsed > 0:
+            sample = difficulty * 2**32 / elapsed
+            self.hashrate += (sample - self.hashrate) * HASHRATE_SMOOTHING
+        self.solutions += 1
+        self.last_solution = now
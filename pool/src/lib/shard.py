@@ -0,0 +1,118 @@
+import asyncio
+import multiprocessing
+import os
+
+from src.helpers.logger import logger
+
+
+# Number of front-end worker processes; 1 keeps the single-process pool
+POOL_WORKERS = int(os.getenv("POOL_WORKERS", "1"))
+# Unix socket the coordinator publishes jobs on
+POOL_IPC_PATH = os.getenv("POOL_IPC_PATH", "/tmp/bitcoin-pool-coordinator.sock")
+
+# Frames are single lines: "<kind> <payload>\n". Payloads are JSON text, which
+# never contains a raw newline.
+FRAME_LIMIT = 2**22
+
+
+def encode_frame(kind, payload):
+    return f"{kind} {payload}\n".encode()
+
+
+async def read_frames(reader):
+    """Yield (kind, payload) tuples until the stream closes."""
+    while True:
+        try:
+            line = await reader.readline()
+        except ConnectionError:
+            return
+        if not line:
+            return
+        kind, _, payload = line.decode().rstrip("\n").partition(" ")
+        yield kind, payload
+
+
+class FrontendLink:
+    """Coordinator-side end of the connection to one front-end worker."""
+
+    def __init__(self, link_id, reader, writer):
+        self.link_id = link_id
+        self.reader = reader
+        self.writer = writer
+        self.client_count = 0
+        # Sessions of the front-end's miners that sent solutions, by session id
+        self.clients = {}
+
+    async def send_frame(self, kind, payload):
+        self.writer.write(encode_frame(kind, payload))
+        await self.writer.drain()
+
+    async def send(self, message_json):
+        """Publish a pre-encoded miner message for the front-end to fan out."""
+        await self.send_frame("broadcast", message_json)
+
+    def frames(self):
+        return read_frames(self.reader)
+
+
+class CoordinatorLink:
+    """Front-end-side end of the connection to the coordinator."""
+
+    def __init__(self, path=POOL_IPC_PATH):
+        self.path = path
+        self.reader = None
+        self.writer = None
+
+    async def connect(self, attempts=50):
+        for _ in range(attempts):
+            try:
+                self.reader, self.writer = await asyncio.open_unix_connection(
+                    self.path, limit=FRAME_LIMIT
+                )
+                return
+            except (FileNotFoundError, ConnectionRefusedError):
+                await asyncio.sleep(0.2)
+        raise ConnectionError(f"Coordinator not reachable at {self.path}")
+
+    async def send_frame(self, kind, payload):
+        self.writer.write(encode_frame(kind, payload))
+        await self.writer.drain()
+
+    def frames(self):
+        return read_frames(self.reader)
+
+
+async def start_coordinator_server(handler, path=POOL_IPC_PATH):
+    """Listen for front-end workers on a Unix socket."""
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(handler, path=path, limit=FRAME_LIMIT)
+    logger.info(f"Coordinator listening on {path}")
+    return server
+
+
+def start_frontends(count, target):
+    """Spawn `count` front-end worker processes running `target(index)`."""
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for i in range(count):
+        process = context.Process(target=target, args=(i,), name=f"pool-frontend-{i}")
+        process.start()
+        workers.append(process)
+    return workers
+
+
+async def supervise_frontends(workers, target, interval=5):
+    """Restart front-end workers that exit."""
+    context = multiprocessing.get_context("spawn")
+    while True:
+        await asyncio.sleep(interval)
+        for i, process in enumerate(workers):
+            if not process.is_alive():
+                logger.warning(
+                    f"Front-end {process.name} exited with {process.exitcode}, restarting"
+                )
+                workers[i] = context.Process(
+                    target=target, args=(i,), name=process.name
+                )
+                workers[i].start()
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import os
+import time
+from io import BytesIO
+
+from src.helpers.logger import logger
+from test_framework.messages import CBlock
+
+
+# Local file holding the pool's warm restart state; empty disables snapshots
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "pool-state.snapshot")
+# Minimum seconds between snapshot writes; changes in between are coalesced
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "1"))
+# Seconds restored ranges are held for their miners after a restart
+RESUME_GRACE = float(os.getenv("RESUME_GRACE", "30"))
+
+SNAPSHOT_VERSION = 2
+
+
+class SnapshotStore:
+    """
+    Persists the pool's jobs and range assignments to a local file.
+
+    Writes are coalesced: `mark_dirty` only flags a change, and a background
+    task writes at most once per interval, atomically via a temporary file.
+    The snapshot is JSON with blocks stored as hex. Blocks are serialized off
+    the event loop, once per job, and cached, since only the range table
+    changes between jobs.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH, interval=SNAPSHOT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.dirty = asyncio.Event()
+        self.block_cache = {}
+
+    def mark_dirty(self):
+        if self.path:
+            self.dirty.set()
+
+    async def run(self, manager):
+        """Write a snapshot of `manager` whenever its state changed."""
+        if not self.path:
+            return
+        while True:
+            await self.dirty.wait()
+            self.dirty.clear()
+            try:
+                state = self.capture(manager)
+                await asyncio.to_thread(self.write, state)
+            except Exception as e:
+                logger.error(f"Failed to write snapshot {self.path}: {e}")
+            await asyncio.sleep(self.interval)
+
+    def capture(self, manager):
+        """
+        Collect the restartable state of a pool. Jobs keep their block objects;
+        `write` encodes them.
+        """
+        jobs = manager.jobs
+        live = [job for job in jobs.slots if job is not None and not jobs.is_stale(job)]
+        current = jobs.current
+        return {
+            "version": SNAPSHOT_VERSION,
+            "saved_at": time.time(),
+            "height": current.height if current else None,
+            "tip": f"{current.prev_block:064x}" if current else None,
+            "next_id": jobs.next_id,
+            "current": current.job_id if current else None,
+            "jobs": [(job.job_id, job.height, job.block) for job in live],
+            "ranges": manager.saved_ranges(),
+        }
+
+    def write(self, state):
+        """Encode the blocks of a captured state and write it. Runs in a worker thread."""
+        self.block_cache = {
+            job_id: self.block_cache.get(job_id) or block.serialize().hex()
+            for job_id, _, block in state["jobs"]
+        }
+        state = dict(
+            state,
+            jobs=[
+                (job_id, height, self.block_cache[job_id])
+                for job_id, height, _ in state["jobs"]
+            ],
+        )
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.path)
+
+    def load(self):
+        """Read the last snapshot, or return None if there is no usable one."""
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable snapshot {self.path}: {e}")
+            return None
+        if (
+            not isinstance(state, dict)
+            or state.get("version") != SNAPSHOT_VERSION
+            or state["current"] is None
+        ):
+            return None
+        return state
+
+
+def load_block(block_hex):
+    block = CBlock()
+    block.deserialize(BytesIO(bytes.fromhex(block_hex)), lazy=True)
+    return block
+
+
+class ResumeTable:
+    """
+    Nonce ranges restored from a snapshot, held for their miners after a
+    restart. A reconnecting miner gets its old range back without disturbing
+    anyone else; the table closes once every range is claimed, when the grace
+    period ends or when a miner it does not know connects.
+    """
+
+    def __init__(self, ranges, grace=RESUME_GRACE):
+        self.ranges = {miner_id: tuple(r) for miner_id, r in ranges.items()}
+        self.deadline = time.monotonic() + grace
+
+    def claim(self, miner_id):
+        """Return the previous range of a miner, or None if it has none."""
+        return self.ranges.pop(miner_id, None)
+
+    def release(self, miner_id, assigned):
+        """Put back the range of a resumed miner that disconnected again."""
+        self.ranges[miner_id] = assigned
+
+    def done(self):
+        return not self.ranges or time.monotonic() >= self.deadline
@@ -0,0 +1,286 @@
+import asyncio
+import json
+import os
+import time
+
+from src.helpers.btc_util import DIFF1_TARGET, EXTRANONCE1_SIZE, EXTRANONCE2_SIZE
+from src.helpers.logger import logger
+from src.lib.metrics import (
+    CLIENTS_EVICTED,
+    NONCES_RECEIVED,
+    SHARES_ACCEPTED,
+    STRATUM_SESSIONS,
+)
+from src.lib.session import Session
+from test_framework.messages import ser_uint256
+
+
+# TCP port of the Stratum v1 listener (0 disables it)
+STRATUM_PORT = int(os.getenv("STRATUM_PORT", "3333"))
+# Share difficulty announced with mining.set_difficulty
+STRATUM_DIFFICULTY = float(os.getenv("STRATUM_DIFFICULTY", "1"))
+STRATUM_LINE_LIMIT = 2**16
+# Unsent bytes a Stratum client may leave buffered before it is disconnected;
+# a client that stops reading would otherwise grow its buffer without bound
+STRATUM_SEND_BUFFER = int(os.getenv("STRATUM_SEND_BUFFER", str(2**20)))
+
+# Standard Stratum error codes
+ERROR_UNKNOWN = [20, "Other/Unknown", None]
+ERROR_STALE = [21, "Job not found", None]
+ERROR_DUPLICATE = [22, "Duplicate share", None]
+ERROR_LOW_DIFFICULTY = [23, "Low difficulty share", None]
+ERROR_UNAUTHORIZED = [24, "Unauthorized worker", None]
+ERROR_NOT_SUBSCRIBED = [25, "Not subscribed", None]
+
+SUBMIT_ERRORS = {
+    "stale": ERROR_STALE,
+    "duplicate": ERROR_DUPLICATE,
+    "invalid": ERROR_LOW_DIFFICULTY,
+}
+
+
+class ExtranonceAllocator:
+    """
+    Hands out unique extranonce1 values. Zero is never handed out: it is the
+    extranonce of every WebSocket miner, which split the nonce range instead.
+    """
+
+    def __init__(self, size=EXTRANONCE1_SIZE):
+        self.limit = 2 ** (8 * size)
+        self.next_value = 1
+        self.free = []
+
+    def allocate(self):
+        if self.free:
+            return self.free.pop()
+        if self.next_value >= self.limit:
+            raise RuntimeError("Extranonce1 space exhausted")
+        value = self.next_value
+        self.next_value += 1
+        return value
+
+    def release(self, value):
+        self.free.append(value)
+
+
+def encode_line(message):
+    return (json.dumps(message) + "\n").encode()
+
+
+def stratum_prevhash(prev_block):
+    """The previous block hash as Stratum sends it: header byte order, 4-byte words swapped."""
+    data = ser_uint256(prev_block)
+    return b"".join(data[i : i + 4][::-1] for i in range(0, 32, 4)).hex()
+
+
+def encode_notify(job, clean_jobs):
+    """Serialize the mining.notify line for a job."""
+    block = job.block
+    params = [
+        f"{job.job_id:x}",
+        stratum_prevhash(block.hashPrevBlock),
+        job.coinb1.hex(),
+        job.coinb2.hex(),
+        [sibling.hex() for sibling in job.merkle_branch],
+        f"{block.nVersion:08x}",
+        f"{block.nBits:08x}",
+        f"{block.nTime:08x}",
+        clean_jobs,
+    ]
+    return encode_line({"id": None, "method": "mining.notify", "params": params})
+
+
+class StratumSession(Session):
+    """
+    State of one Stratum connection. The per-miner accounting is shared with
+    WebSocket sessions; `extranonce` holds the session's extranonce1.
+    """
+
+    __slots__ = (
+        "reader",
+        "writer",
+        "subscribed",
+        "authorized",
+        "worker",
+    )
+
+    def __init__(self, reader, writer, extranonce1, difficulty):
+        super().__init__(None, extranonce=extranonce1, difficulty=difficulty)
+        self.reader = reader
+        self.writer = writer
+        self.subscribed = False
+        self.authorized = False
+        self.worker = None
+
+    def reply(self, msg_id, result, error=None):
+        self.send(encode_line({"id": msg_id, "result": result, "error": error}))
+
+    def send(self, data):
+        """Write a line without waiting, disconnecting a client that stopped reading."""
+        transport = self.writer.transport
+        if transport.is_closing():
+            return
+        if transport.get_write_buffer_size() + len(data) > STRATUM_SEND_BUFFER:
+            CLIENTS_EVICTED.inc()
+            logger.warning("Disconnecting slow Stratum client: send buffer full")
+            transport.abort()
+            return
+        self.writer.write(data)
+
+
+class StratumServer:
+    """
+    Stratum v1 front-end on asyncio streams.
+
+    Jobs, extranonce space and solution checks are shared with the WebSocket
+    path through the pool's ConnectionManager. Each job is serialized into a
+    single mining.notify line that is written as-is to every session.
+    """
+
+    def __init__(self, manager, difficulty=STRATUM_DIFFICULTY):
+        self.manager = manager
+        self.sessions = set()
+        self.extranonces = ExtranonceAllocator()
+        self.difficulty = difficulty
+        self.share_target = int(DIFF1_TARGET / difficulty)
+        self.difficulty_line = encode_line(
+            {"id": None, "method": "mining.set_difficulty", "params": [difficulty]}
+        )
+        self.notify_line = None
+
+    async def start(self, host="0.0.0.0", port=STRATUM_PORT):
+        if self.manager.jobs.current is not None:
+            self.notify_line = encode_notify(self.manager.jobs.current, True)
+        server = await asyncio.start_server(
+            self.handle_session, host, port, limit=STRATUM_LINE_LIMIT
+        )
+        logger.info(f"Stratum server started on port {port}")
+        return server
+
+    def notify(self, job, clean_jobs):
+        """Fan a new job out to every subscribed session."""
+        self.notify_line = encode_notify(job, clean_jobs)
+        for session in self.sessions:
+            if session.subscribed:
+                session.send(self.notify_line)
+
+    async def handle_session(self, reader, writer):
+        """Serve one Stratum connection."""
+        session = StratumSession(
+            reader, writer, self.extranonces.allocate(), self.difficulty
+        )
+        self.sessions.add(session)
+        STRATUM_SESSIONS.set(len(self.sessions))
+        logger.info(f"Stratum client connected. Total sessions: {len(self.sessions)}")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    logger.warning("Received invalid Stratum message")
+                    break
+                self.handle_request(session, request)
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self.sessions.discard(session)
+            STRATUM_SESSIONS.set(len(self.sessions))
+            self.extranonces.release(session.extranonce)
+            writer.close()
+            logger.info(
+                f"Stratum client disconnected. Total sessions: {len(self.sessions)}"
+            )
+
+    def handle_request(self, session, request):
+        if not isinstance(request, dict):
+            logger.warning("Received invalid Stratum message")
+            session.reply(None, None, ERROR_UNKNOWN)
+            return
+        msg_id = request.get("id")
+        method = request.get("method")
+        params = request.get("params") or []
+        if not isinstance(params, list):
+            logger.warning(f"Received invalid params for Stratum method: {method}")
+            session.reply(msg_id, None, ERROR_UNKNOWN)
+            return
+
+        if method == "mining.subscribe":
+            session.subscribed = True
+            subscription = f"{session.extranonce:x}"
+            session.reply(
+                msg_id,
+                [
+                    [
+                        ["mining.set_difficulty", subscription],
+                        ["mining.notify", subscription],
+                    ],
+                    f"{session.extranonce:0{EXTRANONCE1_SIZE * 2}x}",
+                    EXTRANONCE2_SIZE,
+                ],
+            )
+            session.send(self.difficulty_line)
+            if self.notify_line is not None:
+                session.send(self.notify_line)
+        elif method == "mining.authorize":
+            # The pool pays a single address, so any worker name is accepted
+            worker = params[0] if params else None
+            if worker is not None and not isinstance(worker, str):
+                session.reply(msg_id, None, ERROR_UNKNOWN)
+                return
+            session.authorized = True
+            session.worker = worker
+            session.reply(msg_id, True)
+        elif method == "mining.submit":
+            self.submit(session, msg_id, params)
+        elif method == "mining.configure":
+            # No extensions (such as version rolling) are supported
+            session.reply(msg_id, {})
+        elif method == "mining.extranonce.subscribe":
+            session.reply(msg_id, False)
+        else:
+            logger.warning(f"Received unknown Stratum method: {method}")
+            session.reply(msg_id, None, ERROR_UNKNOWN)
+
+    def submit(self, session, msg_id, params):
+        """Check a mining.submit share against the pool's jobs."""
+        received_at = time.perf_counter()
+        NONCES_RECEIVED.inc()
+        if not session.subscribed:
+            session.reply(msg_id, None, ERROR_NOT_SUBSCRIBED)
+            return
+        if not session.authorized:
+            session.reply(msg_id, None, ERROR_UNAUTHORIZED)
+            return
+        try:
+            if not all(isinstance(param, str) for param in params[:5]):
+                raise TypeError("submit params must be hex strings")
+            _, job_id, extranonce2, ntime, nonce = params[:5]
+            extranonce2 = bytes.fromhex(extranonce2)
+            if len(extranonce2) != EXTRANONCE2_SIZE:
+                raise ValueError("extranonce2 size")
+            job_id, ntime, nonce = int(job_id, 16), int(ntime, 16), int(nonce, 16)
+        except (ValueError, TypeError):
+            session.reply(msg_id, None, ERROR_UNKNOWN)
+            return
+
+        extranonce = (session.extranonce << 8 * EXTRANONCE2_SIZE) | int.from_bytes(
+            extranonce2, "big"
+        )
+        result = self.manager.check_solution(
+            session,
+            job_id,
+            extranonce,
+            ntime & 0xFFFFFFFF,
+            nonce & 0xFFFFFFFF,
+            received_at=received_at,
+            share_target=self.share_target,
+        )
+        if result in ("block", "share"):
+            SHARES_ACCEPTED.inc()
+            session.reply(msg_id, True)
+        else:
+            session.reply(msg_id, None, SUBMIT_ERRORS[result])
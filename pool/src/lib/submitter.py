@@ -0,0 +1,88 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.lib.rpc import RPCConnection
+from src.helpers.logger import logger
+
+
+SUBMIT_RETRIES = int(os.getenv("SUBMIT_RETRIES", "3"))
+SUBMIT_RETRY_DELAY = float(os.getenv("SUBMIT_RETRY_DELAY", "0.1"))
+SUBMIT_KEEPALIVE_INTERVAL = float(os.getenv("SUBMIT_KEEPALIVE_INTERVAL", "15"))
+
+
+class BlockSubmitter:
+    """
+    Submits found blocks over a dedicated RPC connection.
+
+    The connection lives on its own single worker thread, so `submitblock`
+    never queues behind template or chain info calls, and is kept warm with a
+    cheap periodic call so submission does not pay for a TCP handshake.
+    """
+
+    def __init__(self, on_result=None, retries=SUBMIT_RETRIES):
+        self.connection = RPCConnection()
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="submitblock"
+        )
+        self.on_result = on_result
+        self.retries = max(retries, 1)
+        self.in_flight = set()
+
+    async def keep_warm(self, interval=SUBMIT_KEEPALIVE_INTERVAL):
+        """Periodically touch the submission connection so it stays open."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(
+                    self.executor, self.connection.call, "getbestblockhash"
+                )
+            except Exception as e:
+                logger.warning(f"Submission connection keep-alive failed: {e}")
+            await asyncio.sleep(interval)
+
+    def submit(self, header, block_tail, height, block_hash, received_at=None):
+        """
+        Schedule a block submission without blocking the caller.
+        :param header: The solved 80-byte block header.
+        :param block_tail: Pre-serialized transaction vector in hex format.
+        :param received_at: `time.perf_counter()` timestamp the solution arrived at.
+        :return: The submission task.
+        """
+        task = asyncio.create_task(
+            self._submit(
+                header.hex() + block_tail,
+                height,
+                block_hash,
+                received_at or time.perf_counter(),
+            )
+        )
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+        return task
+
+    async def _submit(self, block_hex, height, block_hash, received_at):
+        """Send `submitblock`, retrying transport failures with backoff."""
+        loop = asyncio.get_running_loop()
+        result = None
+        error = None
+        for attempt in range(1, self.retries + 1):
+            try:
+                result = await loop.run_in_executor(
+                    self.executor, self.connection.call, "submitblock", [block_hex]
+                )
+                error = None
+                break
+            except ConnectionError as e:
+                error = e
+                if attempt < self.retries:
+                    await asyncio.sleep(SUBMIT_RETRY_DELAY * 2 ** (attempt - 1))
+            except Exception as e:
+                error = e
+                break
+
+        latency = time.perf_counter() - received_at
+        if self.on_result is not None:
+            self.on_result(height, block_hash, result, error, latency)
+        return result
@@ -0,0 +1,82 @@
+import os
+from collections import OrderedDict
+
+from src.lib.metrics import TX_CACHE_HITS, TX_CACHE_MISSES
+from test_framework.messages import (
+    WITNESS_SCALE_FACTOR,
+    LazyTransaction,
+    hash256,
+    ser_uint256,
+)
+
+
+# Serialized transaction bytes kept across templates
+TX_CACHE_BYTES = int(os.getenv("TX_CACHE_BYTES", str(32 * 2**20)))
+
+
+class CachedTx:
+    """A template transaction parsed once: raw bytes, hashes, weight and sigops."""
+
+    __slots__ = ("tx", "raw", "txid", "wtxid", "weight", "sigops")
+
+    def __init__(self, raw, sigops=0):
+        # Only offsets are parsed; inputs and outputs are built if ever accessed
+        self.tx = LazyTransaction(raw)
+        self.raw = raw
+        self.tx.rehash()
+        self.txid = ser_uint256(self.tx.sha256)
+        self.weight = self.tx.get_weight()
+        has_witness = self.weight != WITNESS_SCALE_FACTOR * len(raw)
+        self.wtxid = hash256(raw) if has_witness else self.txid
+        self.sigops = sigops
+
+
+class TxCache:
+    """
+    LRU cache of parsed template transactions keyed by txid, bounded by the
+    total size of their serialized bytes.
+
+    Most of the mempool carries over between templates, so a rebuild only
+    parses and hashes the transactions it has not seen before.
+    """
+
+    def __init__(self, max_bytes=TX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, transactions):
+        """
+        Return the cached entry for each template transaction, parsing new ones.
+        :param transactions: The "transactions" list of a block template.
+        """
+        entries = self.entries
+        result = []
+        hits = 0
+        for txn in transactions:
+            txid = txn["txid"]
+            entry = entries.get(txid)
+            # A transaction whose witness changed keeps its txid but not its wtxid
+            if entry is not None and txn.get("hash", txid) == entry.wtxid[::-1].hex():
+                entries.move_to_end(txid)
+                hits += 1
+            else:
+                entry = CachedTx(bytes.fromhex(txn["data"]), txn.get("sigops", 0))
+                self.store(txid, entry)
+            result.append(entry)
+        TX_CACHE_HITS.inc(hits)
+        TX_CACHE_MISSES.inc(len(result) - hits)
+        return result
+
+    def store(self, txid, entry):
+        previous = self.entries.pop(txid, None)
+        if previous is not None:
+            self.size -= len(previous.raw)
+        self.entries[txid] = entry
+        self.size += len(entry.raw)
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted.raw)
@@ -23,6 +23,7 @@ import hashlib
 import math
 import random
 import socket
+import struct
 import time
 import unittest
 from base64 import b32decode, b32encode
@@ -99,6 +100,47 @@ def hash256(s):
     return sha256(sha256(s))
 
 
+# Streaming serialization: the `*_into` functions and methods append to a
+# single bytearray (amortized linear growth) instead of concatenating bytes
+# objects, which copies the whole prefix on every step. Fixed-size fields are
+# packed with precompiled structs. The plain `serialize` methods are thin
+# wrappers that return bytes.
+OUTPOINT_FORMAT = struct.Struct("<32sI")
+HEADER_FORMAT = struct.Struct("<i32s32sIII")
+
+
+def ser_compact_size_into(buf, l):
+    if l < 253:
+        buf.append(l)
+    else:
+        buf += ser_compact_size(l)
+
+
+def ser_string_into(buf, s):
+    ser_compact_size_into(buf, len(s))
+    buf += s
+
+
+def ser_vector_into(buf, l, ser_function_name=None):
+    """Append a vector, using the entries' `<name>_into` method when they have one."""
+    ser_compact_size_into(buf, len(l))
+    name = ser_function_name or "serialize"
+    name_into = name + "_into"
+    for i in l:
+        serialize_into = getattr(i, name_into, None)
+        if serialize_into is not None:
+            serialize_into(buf)
+        else:
+            buf += getattr(i, name)()
+
+
+def ser_string_vector_into(buf, l):
+    ser_compact_size_into(buf, len(l))
+    for sv in l:
+        ser_compact_size_into(buf, len(sv))
+        buf += sv
+
+
 def ser_compact_size(l):
     r = b""
     if l < 253:
@@ -169,13 +211,9 @@ def deser_vector(f, c, deser_function_name=None):
 # entries in the vector (we use this for serializing the vector of transactions
 # for a witness block).
 def ser_vector(l, ser_function_name=None):
-    r = ser_compact_size(len(l))
-    for i in l:
-        if ser_function_name:
-            r += getattr(i, ser_function_name)()
-        else:
-            r += i.serialize()
-    return r
+    buf = bytearray()
+    ser_vector_into(buf, l, ser_function_name)
+    return bytes(buf)
 
 
 def deser_uint256_vector(f):
@@ -204,10 +242,9 @@ def deser_string_vector(f):
 
 
 def ser_string_vector(l):
-    r = ser_compact_size(len(l))
-    for sv in l:
-        r += ser_string(sv)
-    return r
+    buf = bytearray()
+    ser_string_vector_into(buf, l)
+    return bytes(buf)
 
 
 def from_hex(obj, hex_string):
@@ -220,8 +257,13 @@ def from_hex(obj, hex_string):
     return obj
 
 
-def tx_from_hex(hex_string):
-    """Deserialize from hex string to a transaction object"""
+def tx_from_hex(hex_string, lazy=False):
+    """Deserialize from hex string to a transaction object
+
+    With lazy=True a LazyTransaction is returned, which defers building the
+    inputs, outputs and witnesses until they are accessed."""
+    if lazy:
+        return LazyTransaction(bytes.fromhex(hex_string))
     return from_hex(CTransaction(), hex_string)
 
 
@@ -457,10 +499,10 @@ class COutPoint:
         self.n = int.from_bytes(f.read(4), "little")
 
     def serialize(self):
-        r = b""
-        r += ser_uint256(self.hash)
-        r += self.n.to_bytes(4, "little")
-        return r
+        return OUTPOINT_FORMAT.pack(ser_uint256(self.hash), self.n)
+
+    def serialize_into(self, buf):
+        buf += OUTPOINT_FORMAT.pack(ser_uint256(self.hash), self.n)
 
     def __repr__(self):
         return "COutPoint(hash=%064x n=%i)" % (self.hash, self.n)
@@ -484,11 +526,14 @@ class CTxIn:
         self.nSequence = int.from_bytes(f.read(4), "little")
 
     def serialize(self):
-        r = b""
-        r += self.prevout.serialize()
-        r += ser_string(self.scriptSig)
-        r += self.nSequence.to_bytes(4, "little")
-        return r
+        buf = bytearray()
+        self.serialize_into(buf)
+        return bytes(buf)
+
+    def serialize_into(self, buf):
+        self.prevout.serialize_into(buf)
+        ser_string_into(buf, self.scriptSig)
+        buf += self.nSequence.to_bytes(4, "little")
 
     def __repr__(self):
         return "CTxIn(prevout=%s scriptSig=%s nSequence=%i)" % (
@@ -510,10 +555,13 @@ class CTxOut:
         self.scriptPubKey = deser_string(f)
 
     def serialize(self):
-        r = b""
-        r += self.nValue.to_bytes(8, "little", signed=True)
-        r += ser_string(self.scriptPubKey)
-        return r
+        buf = bytearray()
+        self.serialize_into(buf)
+        return bytes(buf)
+
+    def serialize_into(self, buf):
+        buf += self.nValue.to_bytes(8, "little", signed=True)
+        ser_string_into(buf, self.scriptPubKey)
 
     def __repr__(self):
         return "CTxOut(nValue=%i.%08i scriptPubKey=%s)" % (
@@ -551,6 +599,9 @@ class CTxInWitness:
     def serialize(self):
         return ser_string_vector(self.scriptWitness.stack)
 
+    def serialize_into(self, buf):
+        ser_string_vector_into(buf, self.scriptWitness.stack)
+
     def __repr__(self):
         return repr(self.scriptWitness)
 
@@ -569,13 +620,16 @@ class CTxWitness:
             self.vtxinwit[i].deserialize(f)
 
     def serialize(self):
-        r = b""
+        buf = bytearray()
+        self.serialize_into(buf)
+        return bytes(buf)
+
+    def serialize_into(self, buf):
         # This is different than the usual vector serialization --
         # we omit the length of the vector, which is required to be
         # the same length as the transaction's vin vector.
         for x in self.vtxinwit:
-            r += x.serialize()
-        return r
+            x.serialize_into(buf)
 
     def __repr__(self):
         return "CTxWitness(%s)" % (";".join([repr(x) for x in self.vtxinwit]))
@@ -631,35 +685,49 @@ class CTransaction:
         self.hash = None
 
     def serialize_without_witness(self):
-        r = b""
-        r += self.nVersion.to_bytes(4, "little", signed=True)
-        r += ser_vector(self.vin)
-        r += ser_vector(self.vout)
-        r += self.nLockTime.to_bytes(4, "little")
-        return r
+        buf = bytearray()
+        self.serialize_without_witness_into(buf)
+        return bytes(buf)
+
+    def serialize_without_witness_into(self, buf):
+        buf += self.nVersion.to_bytes(4, "little", signed=True)
+        ser_compact_size_into(buf, len(self.vin))
+        for txin in self.vin:
+            txin.serialize_into(buf)
+        ser_compact_size_into(buf, len(self.vout))
+        for txout in self.vout:
+            txout.serialize_into(buf)
+        buf += self.nLockTime.to_bytes(4, "little")
 
     # Only serialize with witness when explicitly called for
     def serialize_with_witness(self):
+        buf = bytearray()
+        self.serialize_with_witness_into(buf)
+        return bytes(buf)
+
+    def serialize_with_witness_into(self, buf):
         flags = 0
         if not self.wit.is_null():
             flags |= 1
-        r = b""
-        r += self.nVersion.to_bytes(4, "little", signed=True)
+        buf += self.nVersion.to_bytes(4, "little", signed=True)
         if flags:
-            dummy = []
-            r += ser_vector(dummy)
-            r += flags.to_bytes(1, "little")
-        r += ser_vector(self.vin)
-        r += ser_vector(self.vout)
+            # Empty dummy vin vector, then the flags byte
+            buf.append(0)
+            buf.append(flags)
+        ser_compact_size_into(buf, len(self.vin))
+        for txin in self.vin:
+            txin.serialize_into(buf)
+        ser_compact_size_into(buf, len(self.vout))
+        for txout in self.vout:
+            txout.serialize_into(buf)
         if flags & 1:
             if len(self.wit.vtxinwit) != len(self.vin):
                 # vtxinwit must have the same length as vin
                 self.wit.vtxinwit = self.wit.vtxinwit[: len(self.vin)]
                 for _ in range(len(self.wit.vtxinwit), len(self.vin)):
                     self.wit.vtxinwit.append(CTxInWitness())
-            r += self.wit.serialize()
-        r += self.nLockTime.to_bytes(4, "little")
-        return r
+            self.wit.serialize_into(buf)
+        buf += self.nLockTime.to_bytes(4, "little")
 
     # Regular serialization is with witness -- must explicitly
     # call serialize_without_witness to exclude witness data.
@@ -713,6 +781,178 @@ class CTransaction:
         )
 
 
+def read_compact_size(view, pos):
+    """Read a compact size at `pos` of a memoryview; return it and the next offset."""
+    nit = view[pos]
+    if nit < 253:
+        return nit, pos + 1
+    size = 2 if nit == 253 else 4 if nit == 254 else 8
+    return int.from_bytes(view[pos + 1 : pos + 1 + size], "little"), pos + 1 + size
+
+
+class LazyTransaction(CTransaction):
+    """A transaction parsed lazily from a memoryview.
+
+    Construction makes one pass over the bytes and records the offsets of the
+    inputs, outputs, witnesses and locktime without building any CTxIn, CTxOut
+    or witness objects. Ids, weight and both serializations are computed from
+    slices of the original bytes. vin, vout and wit are deserialized on first
+    access; from then on the transaction serializes from its objects like a
+    CTransaction, so edits to them are picked up (call rehash() as usual)."""
+
+    __slots__ = (
+        "_data",
+        "_header",
+        "_n_in",
+        "_vin_at",
+        "_vout_at",
+        "_wit_at",
+        "_lock_at",
+        "_vin",
+        "_vout",
+        "_wit",
+    )
+
+    def __init__(self, data, offset=0):
+        view = memoryview(data)
+        try:
+            vin_at = offset + 4
+            n_in, pos = read_compact_size(view, vin_at)
+            flags = 0
+            if n_in == 0:
+                flags = view[pos]
+                pos += 1
+                if flags != 0:
+                    vin_at = pos
+                    n_in, pos = read_compact_size(view, vin_at)
+            # As in CTransaction.deserialize, an empty vin without flags has no vout
+            vout_at = pos - 1
+            if n_in != 0 or flags != 0:
+                for _ in range(n_in):
+                    script_len, pos = read_compact_size(view, pos + 36)
+                    pos += script_len + 4
+                vout_at = pos
+                n_out, pos = read_compact_size(view, vout_at)
+                for _ in range(n_out):
+                    script_len, pos = read_compact_size(view, pos + 8)
+                    pos += script_len
+            wit_at = pos
+            if flags != 0:
+                for _ in range(n_in):
+                    n_items, pos = read_compact_size(view, pos)
+                    for _ in range(n_items):
+                        item_len, pos = read_compact_size(view, pos)
+                        pos += item_len
+        except IndexError:
+            raise ValueError("Truncated transaction") from None
+        if pos + 4 > len(view):
+            raise ValueError("Truncated transaction")
+        self._data = view[offset : pos + 4]
+        self._n_in = n_in
+        self._vin_at = vin_at - offset
+        self._vout_at = vout_at - offset
+        self._wit_at = wit_at - offset
+        self._lock_at = pos - offset
+        self.nVersion = int.from_bytes(self._data[:4], "little", signed=True)
+        self.nLockTime = int.from_bytes(self._data[self._lock_at :], "little")
+        self._header = (self.nVersion, self.nLockTime)
+        self._vin = self._vout = self._wit = None
+        self.sha256 = None
+        self.hash = None
+
+    def __deepcopy__(self, memo):
+        if self._is_pristine():
+            tx = LazyTransaction(bytes(self._data))
+            tx.sha256, tx.hash = self.sha256, self.hash
+            return tx
+        return CTransaction(self)
+
+    def _is_pristine(self):
+        """True while the original bytes still describe the transaction."""
+        return (
+            self._vin is None
+            and self._vout is None
+            and self._wit is None
+            and self._header == (self.nVersion, self.nLockTime)
+        )
+
+    @property
+    def vin(self):
+        if self._vin is None:
+            f = BytesIO(self._data[self._vin_at : self._vout_at])
+            self._vin = deser_vector(f, CTxIn)
+        return self._vin
+
+    @vin.setter
+    def vin(self, value):
+        self._vin = value
+
+    @property
+    def vout(self):
+        if self._vout is None:
+            f = BytesIO(self._data[self._vout_at : self._wit_at])
+            self._vout = deser_vector(f, CTxOut)
+        return self._vout
+
+    @vout.setter
+    def vout(self, value):
+        self._vout = value
+
+    @property
+    def wit(self):
+        if self._wit is None:
+            self._wit = CTxWitness()
+            if self._wit_at != self._lock_at:
+                self._wit.vtxinwit = [CTxInWitness() for _ in range(self._n_in)]
+                self._wit.deserialize(BytesIO(self._data[self._wit_at : self._lock_at]))
+        return self._wit
+
+    @wit.setter
+    def wit(self, value):
+        self._wit = value
+
+    def serialize_without_witness_into(self, buf):
+        if not self._is_pristine():
+            return super().serialize_without_witness_into(buf)
+        data = self._data
+        if self._vin_at == 4:
+            buf += data
+        else:
+            buf += data[:4]
+            buf += data[self._vin_at : self._wit_at]
+            buf += data[self._lock_at :]
+
+    def serialize_with_witness_into(self, buf):
+        if not self._is_pristine():
+            return super().serialize_with_witness_into(buf)
+        buf += self._data
+
+    def calc_sha256(self, with_witness=False):
+        if not self._is_pristine():
+            return super().calc_sha256(with_witness)
+        data = self._data
+        if with_witness:
+            return uint256_from_str(hash256(data))
+        if self.sha256 is None:
+            if self._vin_at == 4:
+                digest = hash256(data)
+            else:
+                # Hash the stripped serialization from slices, without joining them
+                h = hashlib.sha256(data[:4])
+                h.update(data[self._vin_at : self._wit_at])
+                h.update(data[self._lock_at :])
+                digest = sha256(h.digest())
+            self.sha256 = uint256_from_str(digest)
+        self.hash = ser_uint256(self.sha256)[::-1].hex()
+
+    def get_weight(self):
+        if not self._is_pristine():
+            return super().get_weight()
+        size = len(self._data)
+        stripped_size = size - (self._vin_at - 4) - (self._lock_at - self._wit_at)
+        return (WITNESS_SCALE_FACTOR - 1) * stripped_size + size
+
+
 class CBlockHeader:
     __slots__ = (
         "hash",
@@ -760,24 +1000,34 @@ class CBlockHeader:
         self.hash = None
 
     def serialize(self):
-        r = b""
-        r += self.nVersion.to_bytes(4, "little", signed=True)
-        r += ser_uint256(self.hashPrevBlock)
-        r += ser_uint256(self.hashMerkleRoot)
-        r += self.nTime.to_bytes(4, "little")
-        r += self.nBits.to_bytes(4, "little")
-        r += self.nNonce.to_bytes(4, "little")
-        return r
+        return HEADER_FORMAT.pack(
+            self.nVersion,
+            ser_uint256(self.hashPrevBlock),
+            ser_uint256(self.hashMerkleRoot),
+            self.nTime,
+            self.nBits,
+            self.nNonce,
+        )
+
+    def serialize_into(self, buf, offset=None):
+        """Append the 80-byte header, or write it at `offset` of a preallocated buffer."""
+        if offset is None:
+            buf += CBlockHeader.serialize(self)
+        else:
+            HEADER_FORMAT.pack_into(
+                buf,
+                offset,
+                self.nVersion,
+                ser_uint256(self.hashPrevBlock),
+                ser_uint256(self.hashMerkleRoot),
+                self.nTime,
+                self.nBits,
+                self.nNonce,
+            )
 
     def calc_sha256(self):
         if self.sha256 is None:
-            r = b""
-            r += self.nVersion.to_bytes(4, "little", signed=True)
-            r += ser_uint256(self.hashPrevBlock)
-            r += ser_uint256(self.hashMerkleRoot)
-            r += self.nTime.to_bytes(4, "little")
-            r += self.nBits.to_bytes(4, "little")
-            r += self.nNonce.to_bytes(4, "little")
+            r = CBlockHeader.serialize(self)
             self.sha256 = uint256_from_str(hash256(r))
             self.hash = hash256(r)[::-1].hex()
 
@@ -811,18 +1061,36 @@ class CBlock(CBlockHeader):
         super().__init__(header)
         self.vtx = []
 
-    def deserialize(self, f):
+    def deserialize(self, f, lazy=False):
         super().deserialize(f)
-        self.vtx = deser_vector(f, CTransaction)
+        if not lazy:
+            self.vtx = deser_vector(f, CTransaction)
+            return
+        # Parse the transactions as LazyTransactions over one buffer, then
+        # leave the stream just past the block
+        start = f.tell()
+        data = memoryview(f.read())
+        nit, pos = read_compact_size(data, 0)
+        self.vtx = []
+        for _ in range(nit):
+            tx = LazyTransaction(data, pos)
+            pos += len(tx._data)
+            self.vtx.append(tx)
+        f.seek(start + pos)
 
     def serialize(self, with_witness=True):
-        r = b""
-        r += super().serialize()
-        if with_witness:
-            r += ser_vector(self.vtx, "serialize_with_witness")
-        else:
-            r += ser_vector(self.vtx, "serialize_without_witness")
-        return r
+        buf = bytearray()
+        self.serialize_into(buf, with_witness)
+        return bytes(buf)
+
+    def serialize_into(self, buf, with_witness=True):
+        CBlockHeader.serialize_into(self, buf)
+        ser_compact_size_into(buf, len(self.vtx))
+        for tx in self.vtx:
+            if with_witness:
+                tx.serialize_with_witness_into(buf)
+            else:
+                tx.serialize_without_witness_into(buf)
 
     # Calculate the merkle root given a vector of transaction hashes
     @classmethod
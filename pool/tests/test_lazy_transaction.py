@@ -0,0 +1,111 @@
+import copy
+import random
+from io import BytesIO
+
+import pytest
+
+from benchmarks.fake_bitcoind import synthetic_transaction
+from test_framework.messages import (
+    CBlock,
+    COutPoint,
+    CTransaction,
+    CTxIn,
+    CTxOut,
+    LazyTransaction,
+    tx_from_hex,
+)
+
+
+def sample_transactions():
+    rng = random.Random(3)
+    hexes = [
+        synthetic_transaction(rng, rng.randrange(150, 900))["data"] for _ in range(100)
+    ]
+    # Without witness, with scripts needing 3- and 5-byte compact sizes
+    legacy = CTransaction()
+    legacy.vin = [CTxIn(COutPoint(5, 1), b"\x01" * 300, 7)]
+    legacy.vout = [CTxOut(5, b"\x51" * 70000)]
+    legacy.nLockTime = 99
+    hexes.append(legacy.serialize().hex())
+    hexes.append(CTransaction().serialize().hex())
+    return hexes
+
+
+TRANSACTIONS = sample_transactions()
+
+
+@pytest.mark.parametrize("hex_string", TRANSACTIONS)
+def test_ids_weight_and_serialization_match(hex_string):
+    eager = tx_from_hex(hex_string)
+    lazy = tx_from_hex(hex_string, lazy=True)
+    assert isinstance(lazy, LazyTransaction)
+    eager.rehash()
+    lazy.rehash()
+    assert (lazy.sha256, lazy.hash) == (eager.sha256, eager.hash)
+    assert lazy.calc_sha256(with_witness=True) == eager.calc_sha256(with_witness=True)
+    assert lazy.getwtxid() == eager.getwtxid()
+    assert lazy.get_weight() == eager.get_weight()
+    assert lazy.serialize() == eager.serialize() == bytes.fromhex(hex_string)
+    assert lazy.serialize_without_witness() == eager.serialize_without_witness()
+
+
+@pytest.mark.parametrize("hex_string", TRANSACTIONS)
+def test_fields_are_built_on_access(hex_string):
+    eager = tx_from_hex(hex_string)
+    lazy = tx_from_hex(hex_string, lazy=True)
+    assert (lazy.nVersion, lazy.nLockTime) == (eager.nVersion, eager.nLockTime)
+    assert repr(lazy) == repr(eager)
+
+
+@pytest.mark.parametrize("hex_string", TRANSACTIONS[:10] + TRANSACTIONS[-2:])
+def test_edits_are_serialized(hex_string):
+    eager = tx_from_hex(hex_string)
+    lazy = tx_from_hex(hex_string, lazy=True)
+    if eager.vout:
+        eager.vout[0].nValue += 1
+        lazy.vout[0].nValue += 1
+    eager.nLockTime = lazy.nLockTime = 1234
+    eager.rehash()
+    lazy.rehash()
+    assert lazy.hash == eager.hash
+    assert lazy.serialize() == eager.serialize()
+    assert lazy.get_weight() == eager.get_weight()
+
+
+def test_deepcopy():
+    lazy = tx_from_hex(TRANSACTIONS[0], lazy=True)
+    lazy.rehash()
+    copied = copy.deepcopy(lazy)
+    assert copied.serialize() == lazy.serialize()
+    assert copied.hash == lazy.hash
+    # A materialized transaction copies its objects, not the original bytes
+    lazy.vout[0].nValue += 1
+    edited = copy.deepcopy(lazy)
+    assert edited.serialize() == lazy.serialize()
+    edited.vout[0].nValue += 1
+    assert edited.serialize() != lazy.serialize()
+
+
+def test_truncated_transaction_is_rejected():
+    with pytest.raises(ValueError):
+        tx_from_hex(TRANSACTIONS[0][:-10], lazy=True)
+    with pytest.raises(ValueError):
+        tx_from_hex(TRANSACTIONS[0][:20], lazy=True)
+
+
+def test_lazy_block_deserialize():
+    block = CBlock()
+    block.vtx = [tx_from_hex(hex_string) for hex_string in TRANSACTIONS]
+    block.hashMerkleRoot = block.calc_merkle_root()
+    raw = block.serialize()
+
+    stream = BytesIO(raw + b"trailer")
+    lazy = CBlock()
+    lazy.deserialize(stream, lazy=True)
+    # The stream is left just past the block, as with the eager parser
+    assert stream.read() == b"trailer"
+    assert all(isinstance(tx, LazyTransaction) for tx in lazy.vtx)
+    assert lazy.serialize() == raw
+    assert lazy.serialize(with_witness=False) == block.serialize(with_witness=False)
+    assert lazy.calc_merkle_root() == block.hashMerkleRoot
+    assert lazy.calc_witness_merkle_root() == block.calc_witness_merkle_root()
@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from src.helpers.btc_util import merkle_root_from_branch
+from src.helpers.merkle import MerkleTree
+from test_framework.messages import CBlock, hash256, ser_uint256
+
+
+def reference_root(leaves):
+    return ser_uint256(CBlock.get_merkle_root(list(leaves)))
+
+
+def reference_branch(leaves, index):
+    """Sibling of the leaf at each level, recomputing every level from scratch."""
+    branch = []
+    level = list(leaves)
+    while len(level) > 1:
+        sibling = index ^ 1
+        branch.append(level[sibling] if sibling < len(level) else level[index])
+        level = [
+            hash256(level[i] + level[min(i + 1, len(level) - 1)])
+            for i in range(0, len(level), 2)
+        ]
+        index //= 2
+    return branch
+
+
+def random_leaves(rng, count):
+    return [rng.randbytes(32) for _ in range(count)]
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 4, 5, 7, 8, 9, 16, 17, 100])
+def test_root_and_branches_match_reference(count):
+    rng = random.Random(count)
+    leaves = random_leaves(rng, count)
+    tree = MerkleTree(leaves)
+    assert tree.root == reference_root(leaves)
+    for index in range(count):
+        branch = tree.branch(index)
+        assert branch == reference_branch(leaves, index)
+        assert merkle_root_from_branch(leaves[index], branch, index) == tree.root
+
+
+def test_empty_tree_has_no_root():
+    tree = MerkleTree()
+    assert len(tree) == 0
+    with pytest.raises(ValueError):
+        tree.root
+    tree.update(random_leaves(random.Random(1), 3))
+    tree.update([])
+    with pytest.raises(ValueError):
+        tree.root
+
+
+def test_random_edits_match_reference():
+    rng = random.Random(1)
+    tree = MerkleTree()
+    leaves = []
+    for step in range(2000):
+        op = rng.random()
+        if op < 0.3 or not leaves:
+            leaf = rng.randbytes(32)
+            leaves.append(leaf)
+            tree.append(leaf)
+        elif op < 0.6:
+            index = rng.randrange(len(leaves))
+            leaves[index] = rng.randbytes(32)
+            tree.set_leaf(index, leaves[index])
+        else:
+            # Keep most leaves, replace some, grow or shrink the tree
+            count = rng.randrange(1, 60)
+            leaves = [
+                (
+                    leaves[i]
+                    if i < len(leaves) and rng.random() < 0.7
+                    else rng.randbytes(32)
+                )
+                for i in range(count)
+            ]
+            tree.update(leaves)
+        assert len(tree) == len(leaves), step
+        assert tree.root == reference_root(leaves), step
+        index = rng.randrange(len(leaves))
+        assert tree.branch(index) == reference_branch(leaves, index), step
+
+
+def test_update_only_rehashes_changed_paths(monkeypatch):
+    leaves = random_leaves(random.Random(2), 64)
+    tree = MerkleTree(leaves)
+    calls = []
+    monkeypatch.setattr(
+        "src.helpers.merkle.hash256", lambda data: calls.append(data) or hash256(data)
+    )
+    leaves[0] = b"\x01" * 32
+    tree.update(leaves)
+    # One hash per level above the replaced coinbase leaf
+    assert len(calls) == 6
+    assert tree.root == reference_root(leaves)